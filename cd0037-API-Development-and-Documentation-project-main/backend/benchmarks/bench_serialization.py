@@ -0,0 +1,86 @@
+"""Cost of turning question rows into a JSON response body.
+
+Compares the original path (hydrate Question objects, call format(),
+encode with the stdlib provider) with the path the list routes use now
+(`question_rows()` tuples, `format_question_row()`, encoded to bytes by
+the configured provider, orjson when installed) at 10, 1k and 100k rows.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --sizes 10 1000 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from flaskr import create_app  # noqa: E402
+from models import (  # noqa: E402
+    db, format_question_row, question_rows, Question)
+from catalog import seed_catalog  # noqa: E402
+
+DEFAULT_SIZES = [10, 1000, 100000]
+
+
+def before(app, size):
+    questions = Question.query.order_by(Question.id).limit(size).all()
+    body = [question.format() for question in questions]
+    return DefaultJSONProvider(app).dumps(body).encode()
+
+
+def after(app, size):
+    rows = db.session.execute(
+        question_rows().order_by(Question.id).limit(size))
+    body = [format_question_row(row) for row in rows]
+    return app.json.response(body).get_data()
+
+
+def time_call(app, func, size, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(app, size)
+        samples.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    return statistics.median(samples)
+
+
+def run(database_uri, sizes, repeat):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri})
+    seed_catalog(app, max(sizes))
+
+    print(f'provider: {type(app.json).__name__}')
+    print(f'{"rows":>8} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+    with app.app_context():
+        for size in sizes:
+            before_ms = time_call(app, before, size, repeat)
+            after_ms = time_call(app, after, size, repeat)
+            print(f'{size:>8} {before_ms:>10.3f} {after_ms:>10.3f} '
+                  f'{before_ms / after_ms:>7.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--database-uri', default=None)
+    args = parser.parse_args()
+
+    if args.database_uri:
+        run(args.database_uri, args.sizes, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Synthetic trivia catalog shared by the benchmark scripts."""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from models import db, Question, Category  # noqa: E402
+
+CATEGORY_NAMES = ['Science', 'Art', 'Geography', 'History', 'Entertainment',
+                  'Sports']
+SEED_BATCH = 10000
+
+# Words questions are built from, so search benchmarks have realistic
+# hit rates: a handful of words are common, most are rare.
+VOCABULARY = [
+    'planet', 'river', 'painter', 'capital', 'element', 'battle', 'album',
+    'team', 'ocean', 'mountain', 'novel', 'composer', 'empire', 'island',
+    'treaty', 'molecule', 'desert', 'stadium', 'sculpture', 'symphony',
+    'dynasty', 'volcano', 'galaxy', 'protein', 'language', 'festival',
+    'harbor', 'glacier', 'cathedral', 'orbit', 'theorem', 'fossil', 'comet',
+    'tournament', 'monarch', 'canyon', 'opera', 'satellite', 'peninsula',
+    'enzyme', 'marathon', 'revolution', 'lighthouse', 'telescope', 'mosaic',
+]
+
+
+def question_text(rng, i):
+    words = rng.choices(VOCABULARY, weights=range(len(VOCABULARY), 0, -1),
+                        k=3)
+    return f'Which {words[0]} is linked to the {words[1]} and {words[2]} #{i}?'
+
+
+def seed_catalog(app, questions, categories=len(CATEGORY_NAMES), seed=0):
+    """Recreate the schema and load `questions` rows over `categories`.
+
+    Category sizes are skewed so some categories are much larger than
+    others, like a real catalog.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([
+            Category(type=CATEGORY_NAMES[i % len(CATEGORY_NAMES)] +
+                     ('' if i < len(CATEGORY_NAMES) else f' {i}'))
+            for i in range(categories)])
+        db.session.commit()
+
+        weights = [1 / (i + 1) for i in range(categories)]
+        for start in range(0, questions, SEED_BATCH):
+            rows = [{
+                'question': question_text(rng, i),
+                'answer': f'Answer {i}',
+                'difficulty': rng.randint(1, 5),
+                'category': rng.choices(
+                    range(1, categories + 1), weights=weights)[0],
+            } for i in range(start, min(start + SEED_BATCH, questions))]
+            db.session.execute(insert(Question), rows)
+        db.session.commit()
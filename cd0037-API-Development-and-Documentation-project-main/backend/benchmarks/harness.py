@@ -0,0 +1,274 @@
+"""Load and latency benchmark of every trivia API route.
+
+Seeds a scratch database with a synthetic catalog, then runs worker
+threads against an in-process app for a fixed duration. Each worker
+picks scenarios from a weighted mix that mirrors real traffic: page
+browsing (offset and keyset), category pages, searches, quizzes whose
+previous_questions list grows round by round, and inserts followed by
+deletes of the inserted questions, plus bulk imports, category exports
+and the stats routes. Throughput and p50/p95/p99 latency
+are reported per scenario and saved as JSON, tagged with the current
+commit, so runs can be compared across commits.
+
+Usage (from the backend directory):
+
+    python benchmarks/harness.py --questions 100000 --categories 40 \\
+        --duration 30 --threads 8 --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/harness.py --questions 100000 --compare results/abc123.json
+
+The target database is dropped and recreated, never point it at real data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr import create_app, QUESTIONS_PER_PAGE  # noqa: E402
+from catalog import VOCABULARY, seed_catalog  # noqa: E402
+
+# Relative weight of each scenario in the traffic mix.
+DEFAULT_MIX = {
+    'categories': 10,
+    'list_page': 25,
+    'list_keyset': 10,
+    'category_page': 20,
+    'search': 15,
+    'quiz_round': 15,
+    'insert': 3,
+    'delete': 2,
+    'bulk_import': 1,
+    'export': 1,
+    'metrics': 1,
+}
+IMPORT_RECORDS = 20
+METRICS_PATHS = ['/metrics', '/cache-stats', '/pool-stats']
+QUIZ_LENGTH = 50
+
+
+class Worker:
+    """One simulated client with its own quiz in progress."""
+
+    def __init__(self, app, options, rng):
+        self.client = app.test_client()
+        self.options = options
+        self.rng = rng
+        self.previous_questions = []
+        self.quiz_category = 0
+        self.created = []
+
+    def page(self, pages):
+        # Most traffic looks at the first pages, some goes deep.
+        return min(int(self.rng.paretovariate(1.2)), pages)
+
+    def categories(self):
+        return self.client.get('/categories')
+
+    def list_page(self):
+        pages = self.options.questions // QUESTIONS_PER_PAGE + 1
+        return self.client.get(f'/questions?page={self.page(pages)}')
+
+    def list_keyset(self):
+        after_id = self.rng.randrange(self.options.questions)
+        return self.client.get(f'/questions?after_id={after_id}')
+
+    def category_page(self):
+        category = self.rng.randint(1, self.options.categories)
+        return self.client.get(
+            f'/categories/{category}/questions?page={self.page(10)}')
+
+    def search(self):
+        term = ' '.join(self.rng.sample(VOCABULARY, self.rng.choice([1, 2])))
+        return self.client.post('/questions', json={'searchTerm': term})
+
+    def quiz_round(self):
+        if len(self.previous_questions) >= QUIZ_LENGTH:
+            self.previous_questions = []
+            self.quiz_category = self.rng.choice(
+                [0, self.rng.randint(1, self.options.categories)])
+        res = self.client.post('/quizzes', json={
+            'previous_questions': self.previous_questions,
+            'quiz_category': {'type': 'bench', 'id': self.quiz_category}
+        })
+        question = res.get_json().get('question') if res.is_json else None
+        if question is None:
+            self.previous_questions = [0] * QUIZ_LENGTH
+        else:
+            self.previous_questions.append(question['id'])
+        return res
+
+    def insert(self):
+        res = self.client.post('/questions', json={
+            'question': f'Harness question {self.rng.random()}?',
+            'answer': 'Harness answer',
+            'difficulty': self.rng.randint(1, 5),
+            'category': self.rng.randint(1, self.options.categories)
+        })
+        if res.status_code == 201:
+            self.created.append(res.get_json()['created'])
+        return res
+
+    def delete(self):
+        if not self.created:
+            return self.insert()
+        return self.client.delete(f'/questions/{self.created.pop()}')
+
+    def bulk_import(self):
+        lines = [json.dumps({
+            'question': f'Imported question {self.rng.random()}?',
+            'answer': 'Imported answer',
+            'difficulty': self.rng.randint(1, 5),
+            'category': self.rng.randint(1, self.options.categories)
+        }) for _ in range(IMPORT_RECORDS)]
+        return self.client.post(
+            '/questions/import', data='\n'.join(lines),
+            content_type='application/x-ndjson')
+
+    def export(self):
+        category = self.rng.randint(1, self.options.categories)
+        res = self.client.get(f'/questions/export?category={category}')
+        res.get_data()
+        return res
+
+    def metrics(self):
+        return self.client.get(self.rng.choice(METRICS_PATHS))
+
+
+def run_worker(worker, mix, deadline, samples, errors, lock):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        name = worker.rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        res = getattr(worker, name)()
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.setdefault(name, []).append(elapsed)
+            # Deep pages past the end and empty categories may 404.
+            if res.status_code >= 500 or (res.status_code >= 400 and name
+                                          not in ('list_page', 'export')):
+                errors[name] = errors.get(name, 0) + 1
+
+
+def summarize(latencies, elapsed, errors=0):
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+    else:
+        quantiles = [latencies[0] if latencies else None] * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': quantiles[49],
+        'p95_ms': quantiles[94],
+        'p99_ms': quantiles[98],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options, database_uri):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri})
+    print(f'seeding {options.questions} questions in '
+          f'{options.categories} categories...', file=sys.stderr)
+    seed_catalog(app, options.questions, options.categories, options.seed)
+
+    samples, errors, lock = {}, {}, threading.Lock()
+    workers = [Worker(app, options, random.Random(options.seed + i))
+               for i in range(options.threads)]
+    deadline = time.monotonic() + options.duration
+    started = time.monotonic()
+    threads = [threading.Thread(target=run_worker, args=(
+        worker, DEFAULT_MIX, deadline, samples, errors, lock))
+        for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = {name: summarize(latencies, elapsed, errors.get(name, 0))
+               for name, latencies in sorted(samples.items())}
+    results['all'] = summarize(
+        [value for latencies in samples.values() for value in latencies],
+        elapsed, sum(errors.values()))
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'database': database_uri.split(':', 1)[0],
+            'questions': options.questions,
+            'categories': options.categories,
+            'threads': options.threads,
+            'duration': options.duration,
+            'seed': options.seed,
+        },
+        'results': results,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f'{"scenario":<14} {"req":>7} {"req/s":>8} {"p50 ms":>8} '
+          f'{"p95 ms":>8} {"p99 ms":>8} {"err":>5}'
+          + (f' {"p95 vs base":>12}' if baseline else ''))
+    for name, result in report['results'].items():
+        line = (f'{name:<14} {result["requests"]:>7} {result["rps"]:>8.1f} '
+                f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                f'{result["p99_ms"]:>8.2f} {result["errors"]:>5}')
+        base = (baseline or {}).get('results', {}).get(name)
+        if base and base['p95_ms']:
+            change = (result['p95_ms'] / base['p95_ms'] - 1) * 100
+            line += f' {change:>+11.1f}%'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database-uri', default=None)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='JSON report to compare against')
+    options = parser.parse_args()
+
+    if options.database_uri:
+        report = run(options, options.database_uri)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run(
+                options, f'sqlite:///{os.path.join(tmp, "bench.db")}')
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if options.output:
+        os.makedirs(os.path.dirname(options.output) or '.', exist_ok=True)
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Requests/sec of the WSGI and ASGI deployments under concurrent clients.
+
+Opens N keep-alive connections per target and has each one loop over a
+mix of read routes for a fixed duration, then reports throughput and
+latency percentiles for every concurrency level. Start the servers
+first, pointed at the same database, for example:
+
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:8000 'flaskr:create_app()'
+    uvicorn --factory flaskr.asgi:create_app --workers 4 --port 8001
+
+    python benchmarks/load_test.py \\
+        --url http://127.0.0.1:8000 --url http://127.0.0.1:8001
+
+Only the standard library is needed to drive the load.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_CONCURRENCY = [50, 100, 200, 500]
+DEFAULT_PATHS = [
+    '/categories',
+    '/questions?page=1',
+    '/questions?page=2',
+    '/categories/1/questions',
+]
+
+
+async def request(reader, writer, host, path):
+    """Send one GET and read the reply; returns (status, keep_alive)."""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('server closed the connection')
+    length = 0
+    keep_alive = not status_line.startswith(b'HTTP/1.0')
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value == 'keep-alive'
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def client(url, paths, deadline, latencies, errors):
+    parts = urlsplit(url)
+    connection = None
+    for path in itertools.cycle(paths):
+        if time.monotonic() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(
+                    parts.hostname, parts.port)
+            status, keep_alive = await request(
+                *connection, parts.netloc, path)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(str(e))
+            keep_alive = False
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(status)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_level(url, paths, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*[
+        client(url, paths[i % len(paths):] + paths[:i % len(paths)],
+               deadline, latencies, errors)
+        for i in range(concurrency)])
+    elapsed = time.monotonic() - started
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(
+        latencies) > 1 else [float('nan')] * 99
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98],
+        'errors': len(errors),
+    }
+
+
+async def main_async(args):
+    print(f'{"target":<28} {"clients":>7} {"req/s":>9} {"p50 ms":>8} '
+          f'{"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    for url in args.url:
+        for concurrency in args.concurrency:
+            result = await run_level(
+                url, args.path, concurrency, args.duration)
+            print(f'{url:<28} {concurrency:>7} {result["rps"]:>9.0f} '
+                  f'{result["p50"]:>8.1f} {result["p95"]:>8.1f} '
+                  f'{result["p99"]:>8.1f} {result["errors"]:>6}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', action='append', required=True)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', action='append', default=None)
+    args = parser.parse_args()
+    args.path = args.path or DEFAULT_PATHS
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,200 @@
-from flask import Flask, request, abort, jsonify
+import bisect
+
+import click
+from flask import Flask, request, abort, jsonify, g, stream_with_context
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category, db
+from models import (setup_db, on_question_change, count_rows,
+                    format_question_row, pool_stats, question_rows,
+                    Question, QUESTION_COLUMNS, db)
+from .bulk import (delete_questions, import_questions, is_integer,
+                   iter_question_lines, iter_records, missing_question_fields,
+                   parse_changes, parse_ids, update_question)
+from metrics import RequestMetrics
+import migrations
+from .instrumentation import (instrument_app, render_cache_metrics,
+                              render_group_commit_metrics,
+                              render_pool_metrics)
+from .json_provider import create_json_provider
+from .autocomplete import MAX_SUGGESTIONS, PrefixIndex
+from .cache import CatalogVersion, CategoryCache, create_cache_backend
+from .compression import compress_responses
+from .group_commit import GroupCommit
+from .quiz_index import MAX_DRAW, QuizIndex
+from .quiz_sessions import QuizSessionStore
+from .replicas import route_reads
+from .snapshot import CatalogSnapshot
+from .search import SubstringSearch, create_search_engine, fetch_in_order
+from .search_cache import SearchResultCache, normalize_term
+from .stats import TriggerStats, create_stats, summarize
 
 QUESTIONS_PER_PAGE = 10
 
+IMPORT_MIMETYPES = {'application/x-ndjson', 'text/csv'}
+
+# GET routes answered with an ETag derived from the catalog version.
+CONDITIONAL_ENDPOINTS = {
+    'get_categories', 'get_questions', 'get_questions_by_category'}
+
+# Routes whose reads may be served by a replica when DB_REPLICA_URIS is
+# set. Question writes always go to the primary.
+READ_ENDPOINTS = CONDITIONAL_ENDPOINTS | {
+    'create_or_search_questions', 'export_questions', 'play_quiz',
+    'start_quiz_session', 'next_quiz_question', 'get_stats',
+    'autocomplete_questions'}
+
+
+# Names `?fields=` accepts besides the question columns.
+EXTRA_FIELDS = {'categories'}
+
+
+def question_fields(args):
+    """Return the question columns to select for a `?fields=` projection.
+
+    Without the argument every column is selected. id is always included
+    so clients can still address the questions; unknown names are a 400.
+    """
+    value = args.get('fields')
+    if value is None:
+        return QUESTION_COLUMNS
+
+    names = {name.strip() for name in value.split(',')} - {''}
+    if not names <= set(QUESTION_COLUMNS) | EXTRA_FIELDS:
+        abort(400)
+    return tuple(name for name in QUESTION_COLUMNS
+                 if name == 'id' or name in names)
+
+
+def wants_field(args, name):
+    """Whether a response field outside the question columns is wanted."""
+    value = args.get('fields')
+    return value is None or name in {
+        field.strip() for field in value.split(',')}
+
+
+def page_selection(args, selection):
+    """Limit an id-ordered `question_rows()` select to the requested page.
+
+    Pages are read with LIMIT/OFFSET, or with a keyset seek on
+    Question.id when the request carries an `after_id` cursor, so only
+    the rows of the requested page are loaded and formatted. Returns None
+    for pages before the first one.
+    """
+    after_id = args.get('after_id', None, type=int)
+
+    if after_id is not None:
+        selection = selection.where(Question.id > after_id)
+    else:
+        page = args.get('page', 1, type=int)
+        if page < 1:
+            return None
+        selection = selection.offset((page - 1) * QUESTIONS_PER_PAGE)
+
+    return selection.limit(QUESTIONS_PER_PAGE)
 
-def paginate_questions(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
 
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
+def paginate_questions(request, selection, fields=QUESTION_COLUMNS):
+    selection = page_selection(request.args, selection)
+    if selection is None:
+        return []
 
-    return current_questions
+    rows = db.session.execute(selection)
+
+    return [format_question_row(row, fields) for row in rows]
+
+
+def paginate_snapshot(request, snapshot, category=None,
+                      fields=QUESTION_COLUMNS):
+    """`paginate_questions` for the questions of a catalog snapshot."""
+    after_id = request.args.get('after_id', None, type=int)
+    page = request.args.get('page', 1, type=int)
+    if after_id is None and page < 1:
+        return []
+
+    positions = snapshot.page(
+        category, offset=(page - 1) * QUESTIONS_PER_PAGE,
+        limit=QUESTIONS_PER_PAGE, after_id=after_id)
+    return [snapshot.question(position, fields) for position in positions]
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    app.config.from_object('settings')
 
     if test_config is None:
         setup_db(app)
     else:
+        app.config.from_mapping(test_config)
         database_path = test_config.get('SQLALCHEMY_DATABASE_URI')
         setup_db(app, database_path=database_path)
 
+    app.json = create_json_provider(app)
+
+    request_metrics = RequestMetrics()
+    instrument_app(app, request_metrics)
+    route_reads(app, READ_ENDPOINTS)
+    compress_responses(app)
+
+    cache_backend = create_cache_backend(app)
+    category_cache = CategoryCache(
+        cache_backend, ttl=app.config['CATEGORY_CACHE_TTL'])
+    app.extensions['category_cache'] = category_cache
+    caches = {'categories': category_cache}
+
+    catalog_version = CatalogVersion()
+
+    quiz_index = QuizIndex(max_age=app.config['QUIZ_INDEX_MAX_AGE'])
+    on_question_change(app, quiz_index.apply, quiz_index.invalidate)
+
+    quiz_sessions = QuizSessionStore(
+        max_sessions=app.config['QUIZ_SESSION_MAX'],
+        ttl=app.config['QUIZ_SESSION_TTL'])
+    caches['quizSessions'] = quiz_sessions
+
+    catalog_snapshot = None
+    if app.config['CATALOG_SNAPSHOT_PATH']:
+        catalog_snapshot = CatalogSnapshot(app.config['CATALOG_SNAPSHOT_PATH'])
+
+    prefix_index = PrefixIndex(
+        max_age=app.config['AUTOCOMPLETE_MAX_AGE'],
+        cache_depth=app.config['AUTOCOMPLETE_CACHE_DEPTH'])
+    on_question_change(app, prefix_index.apply, prefix_index.invalidate)
+
+    substring_search = SubstringSearch()
+    search_engine = create_search_engine(
+        app, app.config['SQLALCHEMY_DATABASE_URI'])
+    if hasattr(search_engine, 'apply'):
+        on_question_change(
+            app, search_engine.apply, search_engine.invalidate)
+    search_results = SearchResultCache(
+        catalog_version,
+        max_entries=app.config['SEARCH_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['SEARCH_CACHE_MAX_BYTES'])
+    caches['searchResults'] = search_results
+
+    group_commit = None
+    if app.config['GROUP_COMMIT_WINDOW_MS'] > 0:
+        group_commit = GroupCommit(
+            window=app.config['GROUP_COMMIT_WINDOW_MS'] / 1000,
+            max_batch=app.config['GROUP_COMMIT_MAX_BATCH'])
+
+    catalog_stats = create_stats(app, app.config['SQLALCHEMY_DATABASE_URI'])
+    if hasattr(catalog_stats, 'apply'):
+        on_question_change(
+            app, catalog_stats.apply, catalog_stats.invalidate)
+
+    totals_from_stats = app.config['TOTALS_FROM_STATS']
+    if totals_from_stats == 'auto':
+        totals_from_stats = isinstance(catalog_stats, TriggerStats)
+    else:
+        totals_from_stats = totals_from_stats in (True, 'true')
+
+    def total_questions(selection, category=None):
+        if totals_from_stats:
+            return catalog_stats.total(category)
+        return count_rows(selection)
+
     """
     @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
     """
@@ -36,14 +203,28 @@ def create_app(test_config=None):
     """
     @TODO: Use the after_request decorator to set Access-Control-Allow
     """
+    @app.before_request
+    def check_etag():
+        if (request.method != 'GET' or
+                request.endpoint not in CONDITIONAL_ENDPOINTS):
+            return None
+
+        g.etag = catalog_version.etag(request.full_path)
+        if request.if_none_match.contains_weak(g.etag):
+            return app.response_class(status=304)
+        return None
+
     @app.after_request
     def after_request(response):
+        if 'etag' in g and response.status_code in (200, 304):
+            response.set_etag(g.etag)
+            response.headers['Cache-Control'] = app.config['CACHE_CONTROL']
         response.headers.add(
             'Access-Control-Allow-Headers',
             'Content-Type,Authorization,true')
         response.headers.add(
             'Access-Control-Allow-Methods',
-            'GET,PUT,POST,DELETE,OPTIONS')
+            'GET,PUT,PATCH,POST,DELETE,OPTIONS')
         return response
 
     """
@@ -53,17 +234,9 @@ def create_app(test_config=None):
     """
     @app.route('/categories')  # /api/categories
     def get_categories():
-        categories = Category.query.order_by(Category.id).all()
-
-        if len(categories) == 0:
-            formatted_categories = {}
-        else:
-            formatted_categories = {
-                category.id: category.type for category in categories}
-
         return jsonify({
             'success': True,
-            'categories': formatted_categories
+            'categories': category_cache.categories()
         })
 
     """
@@ -80,45 +253,130 @@ def create_app(test_config=None):
     """
     @app.route('/questions')  # /api/questions
     def get_questions():
-        selection = Question.query.order_by(Question.id).all()
-        current_questions = paginate_questions(request, selection)
+        fields = question_fields(request.args)
+        if 'ids' in request.args:
+            return get_questions_by_ids(
+                request.args['ids'].split(','), fields)
+
+        if catalog_snapshot is not None:
+            snapshot = catalog_snapshot.current()
+            current_questions = paginate_snapshot(
+                request, snapshot, fields=fields)
+            total = snapshot.total()
+        else:
+            selection = question_rows(fields).order_by(Question.id)
+            current_questions = paginate_questions(request, selection, fields)
+            total = total_questions(selection)
 
         if len(current_questions) == 0:
             abort(404)
 
-        categories = Category.query.order_by(Category.id).all()
-        formatted_categories = {
-            category.id: category.type for category in categories}
-
-        return jsonify({
+        response = {
             'success': True,
             'questions': current_questions,
-            'totalQuestions': len(selection),
-            'categories': formatted_categories,
+            'totalQuestions': total,
             'currentCategory': None
+        }
+        if wants_field(request.args, 'categories'):
+            response['categories'] = category_cache.categories()
+        return jsonify(response)
+
+    def get_questions_by_ids(values, fields):
+        try:
+            ids = parse_ids([int(value) for value in values])
+        except ValueError:
+            abort(400)
+
+        questions = [format_question_row(row, fields)
+                     for row in fetch_in_order(ids, fields)]
+        found = {question['id'] for question in questions}
+
+        return jsonify({
+            'success': True,
+            'questions': questions,
+            'missing': [i for i in ids if i not in found],
+            'totalQuestions': len(questions)
+        })
+
+    @app.route('/questions/autocomplete')
+    def autocomplete_questions():
+        prefix = request.args.get('prefix', '')
+        if not prefix.strip():
+            abort(400, description="prefix is required.")
+        limit = request.args.get('limit', 10, type=int)
+        if not 1 <= limit <= MAX_SUGGESTIONS:
+            abort(400, description=f"limit must be 1 to {MAX_SUGGESTIONS}.")
+
+        return jsonify({
+            'success': True,
+            'suggestions': [
+                {'id': question_id, 'question': question}
+                for question_id, question in prefix_index.suggest(
+                    prefix, limit)]
         })
 
     @app.route('/categories/<int:category_id>/questions')
     def get_questions_by_category(category_id):
-        category = Category.query.filter(
-            Category.id == category_id).one_or_none()
-        if category is None:
+        category_type = category_cache.category_type(category_id)
+        if category_type is None:
             abort(404)
+        fields = question_fields(request.args)
 
         try:
-            selection = Question.query.filter(
-                Question.category == category_id).all()
-            current_questions = paginate_questions(request, selection)
+            if catalog_snapshot is not None:
+                snapshot = catalog_snapshot.current()
+                current_questions = paginate_snapshot(
+                    request, snapshot, category_id, fields)
+                total = snapshot.total(category_id)
+            else:
+                selection = question_rows(fields).where(
+                    Question.category == category_id).order_by(Question.id)
+                current_questions = paginate_questions(
+                    request, selection, fields)
+                total = total_questions(selection, category_id)
 
             return jsonify({
                 'success': True,
                 'questions': current_questions,
-                'totalQuestions': len(selection),
-                'currentCategory': category.type
+                'totalQuestions': total,
+                'currentCategory': category_type
             })
         except BaseException:
             abort(422)
 
+    @app.route('/stats')
+    def get_stats():
+        return jsonify({'success': True, **summarize(catalog_stats.counts())})
+
+    @app.route('/stats/rebuild', methods=['POST'])
+    def rebuild_stats():
+        catalog_stats.rebuild()
+        return jsonify({'success': True, **summarize(catalog_stats.counts())})
+
+    @app.route('/cache-stats')
+    def get_cache_stats():
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        return jsonify({'success': True, **stats})
+
+    @app.route('/pool-stats')
+    def get_pool_stats():
+        return jsonify({
+            'success': True,
+            'pool': pool_stats()
+        })
+
+    @app.route('/metrics')
+    def get_metrics():
+        lines = request_metrics.render()
+        lines.extend(render_pool_metrics(pool_stats()))
+        lines.extend(render_cache_metrics(
+            {name: cache.stats() for name, cache in caches.items()}))
+        lines.extend(render_group_commit_metrics(
+            group_commit.stats() if group_commit else None))
+        return app.response_class(
+            '\n'.join(lines) + '\n',
+            mimetype='text/plain; version=0.0.4')
+
     """
     @TODO:
     Create an endpoint to DELETE question using a question ID.
@@ -143,6 +401,61 @@ def create_app(test_config=None):
             print(f"Error in delete_question: {e}")
             abort(422)
 
+    @app.route('/questions/<int:question_id>', methods=['PATCH'])
+    def patch_question(question_id):
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not is_integer(body.get('version')):
+            abort(400, description="version is required.")
+        try:
+            changes = parse_changes(body)
+        except ValueError:
+            abort(400)
+
+        try:
+            question = update_question(question_id, body['version'], changes)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in patch_question: {e}")
+            abort(422)
+
+        if question is None:
+            # Only a failed update pays for a second lookup, to tell a
+            # stale version from a missing question.
+            if db.session.get(Question, question_id) is None:
+                abort(404)
+            abort(409)
+
+        return jsonify({
+            'success': True,
+            'question': question
+        })
+
+    @app.route('/questions', methods=['DELETE'])
+    def batch_delete_questions():
+        body = request.get_json(silent=True)
+
+        if not isinstance(body, dict) or 'ids' not in body:
+            abort(400)
+
+        try:
+            ids = parse_ids(body['ids'])
+        except ValueError:
+            abort(400)
+
+        try:
+            deleted = delete_questions(ids)
+        except Exception as e:
+            print(f"Error in batch_delete_questions: {e}")
+            db.session.rollback()
+            abort(422)
+
+        found = set(deleted)
+        return jsonify({
+            'success': True,
+            'deleted': deleted,
+            'missing': [i for i in ids if i not in found]
+        })
+
     """
     @TODO:
     Create an endpoint to POST a new question,
@@ -172,29 +485,61 @@ def create_app(test_config=None):
             abort(400)
 
         search_term = body.get('searchTerm', None)
+        search_answers = bool(body.get('searchAnswers', False))
+        search_mode = body.get('searchMode', 'fulltext')
+
+        if search_mode not in ('fulltext', 'substring'):
+            abort(400)
+        fields = question_fields(request.args)
 
         if search_term is None:
+            if missing_question_fields(body):
+                abort(400)
+
             new_question = body.get('question')
             new_answer = body.get('answer')
             new_difficulty = body.get('difficulty')
             new_category = body.get('category')
 
-            if not all([new_question, new_answer,
-                       new_difficulty, new_category]):
-                abort(400)
-
         try:
             if search_term:
-                selection = Question.query.order_by(Question.id).filter(
-                    Question.question.ilike(f'%{search_term}%')
-                ).all()
-                current_questions = paginate_questions(request, selection)
+                engine = (substring_search if search_mode == 'substring'
+                          else search_engine)
+                ids = search_results.ids(
+                    (search_mode, search_answers,
+                     normalize_term(search_term, search_mode)),
+                    lambda: engine.ranked_ids(search_term, search_answers))
+
+                page = request.args.get('page', 1, type=int)
+                after_id = request.args.get('after_id', None, type=int)
+                if search_mode == 'substring' and after_id is not None:
+                    # Substring matches are ordered by id, like GET /questions.
+                    start = bisect.bisect_right(ids, after_id)
+                elif search_mode == 'substring' and page < 1:
+                    start = len(ids)
+                else:
+                    start = max(page - 1, 0) * QUESTIONS_PER_PAGE
+                questions = fetch_in_order(
+                    ids[start:start + QUESTIONS_PER_PAGE].tolist(), fields)
+
                 return jsonify({
                     'success': True,
-                    'questions': current_questions,
-                    'totalQuestions': len(selection),
+                    'questions': [
+                        format_question_row(row, fields)
+                        for row in questions],
+                    'totalQuestions': len(ids),
                     'currentCategory': None
                 })
+            elif group_commit is not None:
+                return jsonify({
+                    'success': True,
+                    'created': group_commit.insert({
+                        'question': new_question,
+                        'answer': new_answer,
+                        'difficulty': new_difficulty,
+                        'category': new_category
+                    }),
+                }), 201
             else:
                 question = Question(
                     question=new_question,
@@ -211,6 +556,63 @@ def create_app(test_config=None):
             print(f"Error in create_or_search_questions: {e}")
             abort(422)
 
+    @app.route('/questions/import', methods=['POST'])
+    def bulk_import_questions():
+        if request.mimetype not in IMPORT_MIMETYPES:
+            abort(400)
+
+        batch_size = request.args.get(
+            'batch_size', app.config['IMPORT_BATCH_SIZE'], type=int)
+        if batch_size < 1:
+            abort(400)
+
+        report = import_questions(
+            iter_records(request.stream, request.mimetype), batch_size)
+
+        return jsonify({
+            'success': report['failed'] == 0,
+            'imported': report['imported'],
+            'failed': report['failed'],
+            'batches': report['batches'],
+            'errors': report['errors']
+        })
+
+    @app.route('/questions/export')
+    def export_questions():
+        category_id = request.args.get('category', None, type=int)
+        if (category_id is not None and
+                category_cache.category_type(category_id) is None):
+            abort(404)
+        fields = question_fields(request.args)
+
+        return app.response_class(
+            stream_with_context(iter_question_lines(category_id, fields)),
+            mimetype='application/x-ndjson')
+
+    @app.cli.command('export-questions')
+    @click.option('--category', type=int, default=None,
+                  help='Only export questions of this category id.')
+    @click.option('--output', type=click.File('w'), default='-',
+                  help='File to write to, defaults to stdout.')
+    def export_questions_command(category, output):
+        """Stream every question as NDJSON."""
+        for line in iter_question_lines(category):
+            output.write(line)
+
+    @app.cli.command('migrate')
+    @click.option('--list', 'list_only', is_flag=True,
+                  help='Only list the pending migrations.')
+    def migrate_command(list_only):
+        """Apply pending schema migrations."""
+        if list_only:
+            steps = migrations.pending_migrations(db.engine)
+        else:
+            steps = migrations.upgrade(db.engine)
+        for version, description in steps:
+            click.echo(f'{version:04d} {description}')
+        if not steps:
+            click.echo('Database is up to date.')
+
     @app.route('/quizzes', methods=['POST'])
     def play_quiz():
         body = request.get_json()
@@ -226,30 +628,86 @@ def create_app(test_config=None):
                 400,
                 description="Request body must contain 'previous_questions' and 'quiz_category'.")
 
-        try:
-            query = Question.query.filter(
-                Question.id.notin_(previous_questions))
-
-            if quiz_category['id'] != 0:
-                query = query.filter(
-                    Question.category == str(
-                        quiz_category['id']))
+        count = body.get('count', 1)
+        if not isinstance(count, int) or not 1 <= count <= MAX_DRAW:
+            abort(400, description=f"count must be 1 to {MAX_DRAW}.")
 
-            remaining_questions = query.all()
-
-            next_question = None
-            if remaining_questions:
-                next_question = random.choice(remaining_questions).format()
+        try:
+            if catalog_snapshot is not None:
+                snapshot = catalog_snapshot.current()
+                questions = [snapshot.question(position)
+                             for position in snapshot.draw(
+                                 int(quiz_category['id']),
+                                 previous_questions, count)]
+            else:
+                questions = [format_question_row(row)
+                             for row in quiz_index.draw(
+                                 quiz_category['id'], previous_questions,
+                                 count)]
 
-            return jsonify({
+            response = {
                 'success': True,
-                'question': next_question
-            })
+                'question': questions[0] if questions else None
+            }
+            if 'count' in body:
+                response['questions'] = questions
+            return jsonify(response)
 
         except Exception as e:
             print(f"Error in play_quiz query logic: {e}")
             abort(422)
 
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz_session():
+        body = request.get_json(silent=True)
+
+        if not isinstance(body, dict) or body.get('quiz_category') is None:
+            abort(400)
+
+        try:
+            category_id = int(body['quiz_category']['id'])
+        except (KeyError, TypeError, ValueError):
+            abort(422)
+
+        if category_id and category_cache.category_type(category_id) is None:
+            abort(404)
+
+        deck = quiz_index.deck(category_id)
+        return jsonify({
+            'success': True,
+            'token': quiz_sessions.create(deck),
+            'totalQuestions': len(deck)
+        }), 201
+
+    @app.route('/quizzes/sessions/<token>/next', methods=['POST'])
+    def next_quiz_question(token):
+        question = None
+        while question is None:
+            try:
+                question_id, remaining = quiz_sessions.pop(token)
+            except KeyError:
+                abort(404)
+            if question_id is None:
+                break
+            # Skips questions deleted since the session started.
+            question = db.session.get(Question, question_id)
+
+        return jsonify({
+            'success': True,
+            'question': question.format() if question else None,
+            'remaining': remaining
+        })
+
+    @app.route('/quizzes/sessions/<token>', methods=['DELETE'])
+    def end_quiz_session(token):
+        if not quiz_sessions.delete(token):
+            abort(404)
+
+        return jsonify({
+            'success': True,
+            'deleted': token
+        })
+
     """
     @TODO:
     Create a GET endpoint to get questions based on category.
@@ -293,6 +751,14 @@ def create_app(test_config=None):
             "message": "resource not found"
         }), 404
 
+    @app.errorhandler(409)
+    def conflict(error):
+        return jsonify({
+            "success": False,
+            "error": 409,
+            "message": "conflict"
+        }), 409
+
     @app.errorhandler(422)
     def unprocessable(error):
         return jsonify({
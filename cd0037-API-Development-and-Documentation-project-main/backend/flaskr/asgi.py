@@ -0,0 +1,333 @@
+"""ASGI deployment of the trivia API on SQLAlchemy's asyncio engine.
+
+`create_app` here builds a Quart application serving the routes the
+frontend uses from `flaskr.create_app`, with the same JSON contracts and
+query parameters, but every database call awaits an async driver
+(asyncpg for PostgreSQL, aiosqlite for SQLite) instead of pinning a
+worker thread. Only those routes are served: GET /categories, GET
+/questions, GET /categories/<id>/questions, POST and DELETE /questions,
+and POST /quizzes. Run it with any ASGI server, for example:
+
+    uvicorn --factory flaskr.asgi:create_app --workers 4
+
+Quart and the async drivers are optional dependencies; the WSGI app in
+`flaskr` does not need them. The in-process indexes, caches and ETags of
+the WSGI app are not shared with this mode: the quiz draws in the
+database and search uses PostgreSQL full-text search or substring
+matching.
+"""
+from sqlalchemy import func
+
+from models import (configure_sqlite, count_statement, database_path,
+                    format_question_row, pool_options, question_rows,
+                    Category, Question)
+from . import page_selection, question_fields, wants_field
+from .bulk import missing_question_fields, parse_ids
+from .quiz_index import MAX_DRAW
+from .search import PostgresSearch, SubstringSearch
+
+try:
+    from quart import Quart, request, abort, jsonify
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+except ImportError:  # optional, only needed for the ASGI deployment
+    Quart = None
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(database_uri):
+    """Rewrite a sync database URI to use the matching asyncio driver."""
+    scheme, separator, rest = database_uri.partition('://')
+    dialect = scheme.split('+')[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f'No asyncio driver configured for {scheme}')
+    return ASYNC_DRIVERS[dialect] + separator + rest
+
+
+def create_app(test_config=None):
+    if Quart is None:
+        raise RuntimeError(
+            'The ASGI mode needs quart and sqlalchemy[asyncio] installed')
+
+    app = Quart(__name__)
+    app.config.from_object('settings')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_path
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    engine_options = pool_options(app.config, database_uri)
+    if app.config['DB_STATEMENT_TIMEOUT'] and database_uri.startswith(
+            'postgresql'):
+        engine_options['connect_args'] = {'server_settings': {
+            'statement_timeout': str(app.config['DB_STATEMENT_TIMEOUT'])}}
+    if engine_options and database_uri.startswith('sqlite'):
+        # aiosqlite would pick a single-connection pool for shared-cache
+        # in-memory databases.
+        engine_options['poolclass'] = AsyncAdaptedQueuePool
+    engine = create_async_engine(
+        async_database_uri(database_uri), **engine_options)
+    if engine.dialect.name == 'sqlite':
+        configure_sqlite(engine.sync_engine, app.config)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    substring_search = SubstringSearch()
+    fulltext_search = (PostgresSearch()
+                       if database_uri.startswith('postgresql') else None)
+
+    @app.after_serving
+    async def dispose_engine():
+        await engine.dispose()
+
+    @app.after_request
+    async def after_request(response):
+        response.headers.add(
+            'Access-Control-Allow-Headers',
+            'Content-Type,Authorization,true')
+        response.headers.add(
+            'Access-Control-Allow-Methods',
+            'GET,PUT,POST,DELETE,OPTIONS')
+        return response
+
+    async def fetch_page(session, selection, fields):
+        selection = page_selection(request.args, selection)
+        if selection is None:
+            return []
+        rows = await session.execute(selection)
+        return [format_question_row(row, fields) for row in rows]
+
+    async def fetch_categories(session):
+        rows = await session.execute(
+            Category.__table__.select().order_by(Category.id))
+        return {category_id: category_type
+                for category_id, category_type in rows}
+
+    @app.route('/categories')
+    async def get_categories():
+        async with Session() as session:
+            categories = await fetch_categories(session)
+
+        return jsonify({
+            'success': True,
+            'categories': categories
+        })
+
+    @app.route('/questions')
+    async def get_questions():
+        fields = question_fields(request.args)
+        if 'ids' in request.args:
+            return await get_questions_by_ids(
+                request.args['ids'].split(','), fields)
+
+        selection = question_rows(fields).order_by(Question.id)
+        async with Session() as session:
+            current_questions = await fetch_page(session, selection, fields)
+            if len(current_questions) == 0:
+                abort(404)
+            total_questions = await session.scalar(
+                count_statement(selection))
+            response = {
+                'success': True,
+                'questions': current_questions,
+                'totalQuestions': total_questions,
+                'currentCategory': None
+            }
+            if wants_field(request.args, 'categories'):
+                response['categories'] = await fetch_categories(session)
+
+        return jsonify(response)
+
+    async def get_questions_by_ids(values, fields):
+        try:
+            ids = parse_ids([int(value) for value in values])
+        except ValueError:
+            abort(400)
+
+        async with Session() as session:
+            rows = await session.execute(
+                question_rows(fields).where(Question.id.in_(ids)))
+            by_id = {row.id: format_question_row(row, fields)
+                     for row in rows}
+
+        return jsonify({
+            'success': True,
+            'questions': [by_id[i] for i in ids if i in by_id],
+            'missing': [i for i in ids if i not in by_id],
+            'totalQuestions': len(by_id)
+        })
+
+    @app.route('/categories/<int:category_id>/questions')
+    async def get_questions_by_category(category_id):
+        async with Session() as session:
+            category = await session.get(Category, category_id)
+            if category is None:
+                abort(404)
+            fields = question_fields(request.args)
+
+            selection = question_rows(fields).where(
+                Question.category == category_id).order_by(Question.id)
+            current_questions = await fetch_page(session, selection, fields)
+            total_questions = await session.scalar(
+                count_statement(selection))
+
+        return jsonify({
+            'success': True,
+            'questions': current_questions,
+            'totalQuestions': total_questions,
+            'currentCategory': category.type
+        })
+
+    @app.route('/questions/<int:question_id>', methods=['DELETE'])
+    async def delete_question(question_id):
+        async with Session() as session:
+            question = await session.get(Question, question_id)
+            if question is None:
+                abort(404)
+
+            await session.delete(question)
+            await session.commit()
+
+        return jsonify({
+            'success': True,
+            'deleted': question_id
+        })
+
+    @app.route('/questions', methods=['POST'])
+    async def create_or_search_questions():
+        body = await request.get_json()
+
+        if not body:
+            abort(400)
+
+        search_term = body.get('searchTerm', None)
+        search_answers = bool(body.get('searchAnswers', False))
+        search_mode = body.get('searchMode', 'fulltext')
+
+        if search_mode not in ('fulltext', 'substring'):
+            abort(400)
+        fields = question_fields(request.args)
+
+        if search_term is None:
+            if missing_question_fields(body):
+                abort(400)
+
+            question = Question(
+                question=body['question'],
+                answer=body['answer'],
+                difficulty=body['difficulty'],
+                category=body['category']
+            )
+            async with Session() as session:
+                session.add(question)
+                try:
+                    await session.commit()
+                except Exception as e:
+                    print(f"Error in create_or_search_questions: {e}")
+                    abort(422)
+
+            return jsonify({
+                'success': True,
+                'created': question.id,
+            }), 201
+
+        if not search_term:
+            abort(422)
+
+        engine_search = fulltext_search
+        if search_mode == 'substring' or engine_search is None:
+            engine_search = substring_search
+        selection = engine_search.query(search_term, search_answers, fields)
+
+        async with Session() as session:
+            current_questions = await fetch_page(session, selection, fields)
+            total_questions = await session.scalar(
+                count_statement(selection))
+
+        return jsonify({
+            'success': True,
+            'questions': current_questions,
+            'totalQuestions': total_questions,
+            'currentCategory': None
+        })
+
+    @app.route('/quizzes', methods=['POST'])
+    async def play_quiz():
+        body = await request.get_json()
+
+        if not body:
+            abort(400)
+
+        previous_questions = body.get('previous_questions')
+        quiz_category = body.get('quiz_category')
+
+        if previous_questions is None or quiz_category is None:
+            abort(400)
+
+        count = body.get('count', 1)
+        if not isinstance(count, int) or not 1 <= count <= MAX_DRAW:
+            abort(400)
+
+        try:
+            category_id = int(quiz_category['id'])
+            previous_questions = [int(question_id)
+                                  for question_id in previous_questions]
+        except (KeyError, TypeError, ValueError):
+            abort(422)
+
+        selection = question_rows()
+        if previous_questions:
+            selection = selection.where(
+                Question.id.notin_(previous_questions))
+        if category_id != 0:
+            selection = selection.where(Question.category == category_id)
+
+        async with Session() as session:
+            rows = await session.execute(
+                selection.order_by(func.random()).limit(count))
+            questions = [format_question_row(row) for row in rows]
+
+        response = {
+            'success': True,
+            'question': questions[0] if questions else None
+        }
+        if 'count' in body:
+            response['questions'] = questions
+        return jsonify(response)
+
+    @app.errorhandler(400)
+    async def bad_request(error):
+        return jsonify({
+            "success": False,
+            "error": 400,
+            "message": "bad request"
+        }), 400
+
+    @app.errorhandler(404)
+    async def not_found(error):
+        return jsonify({
+            "success": False,
+            "error": 404,
+            "message": "resource not found"
+        }), 404
+
+    @app.errorhandler(422)
+    async def unprocessable(error):
+        return jsonify({
+            "success": False,
+            "error": 422,
+            "message": "unprocessable"
+        }), 422
+
+    @app.errorhandler(500)
+    async def internal_server_error(error):
+        return jsonify({
+            "success": False,
+            "error": 500,
+            "message": "internal server error"
+        }), 500
+
+    return app
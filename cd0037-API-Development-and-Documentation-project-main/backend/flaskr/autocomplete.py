@@ -0,0 +1,185 @@
+import bisect
+import heapq
+import math
+import re
+from array import array
+from itertools import islice
+
+from models import db, Question
+from .live_index import LiveIndex
+from .search import tokenize
+
+# Most suggestions one request may ask for; also the length of the
+# cached top lists.
+MAX_SUGGESTIONS = 25
+
+# A rank packs (title length, id) into one integer, so postings stay
+# compact int64 arrays whose natural order puts shorter titles first.
+ID_BITS = 40
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def rank(question_id, title):
+    return (len(title) << ID_BITS) | question_id
+
+
+def prefix_end(prefix):
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class PrefixIndex(LiveIndex):
+    """In-memory autocomplete over the words of question titles.
+
+    Keeps the sorted vocabulary of title words and, per word, an array of
+    the ranks of the questions using it. A prefix covers a contiguous
+    slice of the vocabulary found by bisection, and its suggestions are
+    the best ranks merged across that slice. Prefixes of up to
+    `cache_depth` characters cover the most words, so their top
+    MAX_SUGGESTIONS are cached and kept current on inserts; lookups then
+    cost the same at a million questions as at a thousand.
+
+    Memory grows with one 8-byte rank per distinct word of each title,
+    the titles themselves, and at most MAX_SUGGESTIONS ids per cached
+    prefix. Loaded on first use, kept current through question listeners
+    and reloaded once older than `max_age` seconds to pick up other
+    workers' writes.
+    """
+
+    def __init__(self, max_age=300, cache_depth=3, max_scan=1000):
+        super().__init__(max_age)
+        self.cache_depth = cache_depth
+        self.max_scan = max_scan
+        self._words = []
+        self._postings = {}
+        self._titles = {}
+        self._top = {}
+
+    def _load(self):
+        rows = db.session.query(Question.id, Question.question).all()
+        postings, titles = {}, {}
+        for question_id, title in rows:
+            titles[question_id] = title
+            question_rank = rank(question_id, title)
+            for word in set(tokenize(title)):
+                postings.setdefault(word, []).append(question_rank)
+        postings = {word: array('q', sorted(ranks))
+                    for word, ranks in postings.items()}
+        return sorted(postings), postings, titles
+
+    def _install(self, state):
+        self._words, self._postings, self._titles = state
+        self._top = {}
+
+    def _apply(self, action, questions):
+        for question in questions:
+            self._remove(question['id'])
+            if action != 'delete':
+                self._add(question['id'], question['question'])
+
+    def _add(self, question_id, title):
+        self._titles[question_id] = title
+        question_rank = rank(question_id, title)
+        for word in set(tokenize(title)):
+            ranks = self._postings.get(word)
+            if ranks is None:
+                ranks = self._postings[word] = array('q')
+                bisect.insort(self._words, word)
+            bisect.insort(ranks, question_rank)
+            for length in range(1, min(len(word), self.cache_depth) + 1):
+                top = self._top.get(word[:length])
+                if top is not None and question_rank not in top:
+                    bisect.insort(top, question_rank)
+                    del top[MAX_SUGGESTIONS:]
+
+    def _remove(self, question_id):
+        title = self._titles.pop(question_id, None)
+        if title is None:
+            return
+        question_rank = rank(question_id, title)
+        for word in set(tokenize(title)):
+            ranks = self._postings[word]
+            position = bisect.bisect_left(ranks, question_rank)
+            if position < len(ranks) and ranks[position] == question_rank:
+                del ranks[position]
+            if not ranks:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+            for length in range(1, min(len(word), self.cache_depth) + 1):
+                top = self._top.get(word[:length])
+                if top is not None and question_rank in top:
+                    # The next best rank is unknown; merge again when asked.
+                    del self._top[word[:length]]
+
+    def _span(self, prefix):
+        """Slice of the vocabulary holding the words starting with `prefix`."""
+        start = bisect.bisect_left(self._words, prefix)
+        return start, bisect.bisect_left(self._words, prefix_end(prefix), start)
+
+    def _ranks(self, prefix):
+        """Iterate the ranks of questions with a word starting with `prefix`.
+
+        A question with several such words comes up once per word.
+        """
+        start, end = self._span(prefix)
+        if end - start == 1:
+            return iter(self._postings[self._words[start]])
+        return heapq.merge(
+            *(self._postings[word] for word in self._words[start:end]))
+
+    def _size(self, prefix):
+        """Number of postings under `prefix`, or inf past `max_scan` words."""
+        start, end = self._span(prefix)
+        if end - start > self.max_scan:
+            return math.inf
+        return sum(len(self._postings[word])
+                   for word in self._words[start:end])
+
+    def _top_ranks(self, prefix):
+        if len(prefix) > self.cache_depth:
+            return list(islice(self._distinct(prefix), MAX_SUGGESTIONS))
+        top = self._top.get(prefix)
+        if top is None:
+            top = self._top[prefix] = list(
+                islice(self._distinct(prefix), MAX_SUGGESTIONS))
+        return top
+
+    def _distinct(self, prefix):
+        """Like `_ranks`, but each question only comes up once."""
+        previous = None
+        for question_rank in self._ranks(prefix):
+            if question_rank != previous:
+                yield question_rank
+                previous = question_rank
+
+    def suggest(self, term, limit=10):
+        """Return up to `limit` (id, title) pairs matching `term`.
+
+        Every word of `term` must start a word of the title. With several
+        words, candidates come from the one matching the fewest postings
+        and at most `max_scan` of them are checked against the others,
+        which bounds the cost of multi-word lookups.
+        """
+        self._ensure_loaded()
+        words = set(tokenize(term))
+        if not words:
+            return []
+
+        with self._lock:
+            if len(words) == 1:
+                ranks = self._top_ranks(words.pop())[:limit]
+            else:
+                words = sorted(words, key=lambda word: (self._size(word), word))
+                patterns = [re.compile(r'\b' + re.escape(word), re.IGNORECASE)
+                            for word in words[1:]]
+                ranks = []
+                for question_rank in islice(
+                        self._distinct(words[0]), self.max_scan):
+                    title = self._titles[question_rank & ID_MASK]
+                    if all(pattern.search(title) for pattern in patterns):
+                        ranks.append(question_rank)
+                        if len(ranks) == limit:
+                            break
+            return [(question_rank & ID_MASK,
+                     self._titles[question_rank & ID_MASK])
+                    for question_rank in ranks]
@@ -0,0 +1,309 @@
+import csv
+import io
+import json
+
+from sqlalchemy import delete, insert, text, update
+
+from models import (db, bump_catalog_version, notify_question_change,
+                    format_question_row, question_rows, Question,
+                    QUESTION_COLUMNS)
+
+QUESTION_FIELDS = ('question', 'answer', 'difficulty', 'category')
+
+# Rows fetched per round trip from the server-side cursor of an export.
+EXPORT_YIELD_PER = 1000
+
+# Cap on the error entries echoed back, so a bad upload cannot grow the
+# response without bound; the failed count always covers every row.
+MAX_REPORTED_ERRORS = 100
+
+# Most ids one batch delete or multi-get may name.
+MAX_BATCH_IDS = 1000
+
+
+# Fields stored as integers; the others are text.
+INTEGER_FIELDS = {'difficulty', 'category'}
+
+
+def missing_question_fields(data):
+    return [field for field in QUESTION_FIELDS if not data.get(field)]
+
+
+def is_integer(value):
+    """Whether a decoded JSON value is an integer (booleans are not)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def text_value(field, value):
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value
+
+
+def integer_value(field, value):
+    if not is_integer(value):
+        raise ValueError(f'{field} must be an integer')
+    return value
+
+
+def parse_changes(body):
+    """Validate the question fields present in a partial update.
+
+    Raises ValueError when there are none, or one is empty or not of its
+    JSON type: a string for the texts, an integer for the others.
+    """
+    changes = {}
+    for field in QUESTION_FIELDS:
+        if field not in body:
+            continue
+        value = body[field]
+        if value is None or value == '':
+            raise ValueError(f'{field} must not be empty')
+        changes[field] = (integer_value(field, value)
+                          if field in INTEGER_FIELDS
+                          else text_value(field, value))
+    if not changes:
+        raise ValueError(f"expected one of {', '.join(QUESTION_FIELDS)}")
+    return changes
+
+
+def iter_records(stream, content_type):
+    """Yield (line number, dict) pairs from an NDJSON or CSV body.
+
+    The body is read one line at a time so uploads are never buffered
+    whole. Lines that cannot be decoded or parsed yield a ValueError
+    instead of a dict.
+    """
+    raw_lines = enumerate(iter(stream.readline, b''), start=1)
+
+    if content_type == 'text/csv':
+        yield from _iter_csv_records(raw_lines)
+        return
+
+    for line_number, raw_line in raw_lines:
+        try:
+            line = raw_line.decode('utf-8')
+        except UnicodeDecodeError as e:
+            yield line_number, e
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        if not isinstance(record, dict):
+            record = ValueError('expected a JSON object')
+        yield line_number, record
+
+
+def _iter_csv_records(raw_lines):
+    # The reader does not count the line it fails on, so the last line
+    # handed to it is tracked here instead of using reader.line_num.
+    errors, line_number = [], 0
+
+    def lines():
+        nonlocal line_number
+        for line_number, raw_line in raw_lines:
+            try:
+                yield raw_line.decode('utf-8')
+            except UnicodeDecodeError as e:
+                errors.append((line_number, e))
+                # Stands in for the line; the reader skips blank lines.
+                yield '\n'
+
+    reader = csv.DictReader(lines())
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            record = ValueError(str(e))
+        yield from errors
+        errors.clear()
+        yield line_number, record
+    yield from errors
+
+
+def parse_record(record):
+    """Validate a record the way POST /questions does and coerce types.
+
+    The integer fields may also be decimal strings, as CSV bodies only
+    carry strings.
+    """
+    if isinstance(record, Exception):
+        raise record
+    missing = missing_question_fields(record)
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    row = {field: text_value(field, record[field])
+           for field in ('question', 'answer')}
+    for field in INTEGER_FIELDS:
+        value = record[field]
+        row[field] = integer_value(
+            field, int(value) if isinstance(value, str) else value)
+    return row
+
+
+def _copy_batch(rows):
+    """Insert rows with COPY, reserving their ids from the sequence first."""
+    connection = db.session.connection()
+    ids = connection.execute(text(
+        "SELECT nextval(pg_get_serial_sequence('questions', 'id')) "
+        "FROM generate_series(1, :count)"), {'count': len(rows)}
+    ).scalars().all()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for question_id, row in zip(ids, rows):
+        row['id'] = question_id
+        writer.writerow([question_id, row['question'], row['answer'],
+                         row['difficulty'], row['category']])
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        'COPY questions (id, question, answer, difficulty, category) '
+        'FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _insert_batch(rows):
+    ids = db.session.execute(
+        insert(Question).returning(
+            Question.id, sort_by_parameter_order=True),
+        rows).scalars().all()
+    for question_id, row in zip(ids, rows):
+        row['id'] = question_id
+
+
+def write_questions(rows):
+    """Insert question dicts in one transaction and notify listeners.
+
+    Each dict gets the id of its new row.
+    """
+    if db.session.get_bind().dialect.driver == 'psycopg2':
+        _copy_batch(rows)
+    else:
+        _insert_batch(rows)
+    bump_catalog_version(db.session.connection())
+    db.session.commit()
+    notify_question_change('insert', rows)
+
+
+def import_questions(records, batch_size):
+    """Insert parsed records in batches of `batch_size`, one commit each.
+
+    Invalid rows are skipped and reported by line; a batch the database
+    rejects is rolled back and reported as a whole while the following
+    batches carry on.
+    """
+    report = {'imported': 0, 'failed': 0, 'batches': 0, 'errors': []}
+
+    def add_error(error):
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append(error)
+
+    def flush(rows, lines):
+        report['batches'] += 1
+        try:
+            write_questions(rows)
+            report['imported'] += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            report['failed'] += len(rows)
+            add_error({
+                'batch': report['batches'],
+                'lines': [lines[0], lines[-1]],
+                'message': str(e).splitlines()[0]
+            })
+
+    rows, lines = [], []
+    for line_number, record in records:
+        try:
+            rows.append(parse_record(record))
+            lines.append(line_number)
+        except (TypeError, ValueError) as e:
+            report['failed'] += 1
+            add_error({'line': line_number, 'message': str(e)})
+            continue
+
+        if len(rows) >= batch_size:
+            flush(rows, lines)
+            rows, lines = [], []
+
+    if rows:
+        flush(rows, lines)
+
+    return report
+
+
+def parse_ids(values):
+    """Return the distinct ids of a list of integers, in their given order.
+
+    Raises ValueError when `values` is not a list, has no ids or too
+    many, or holds anything but integers.
+    """
+    if not isinstance(values, list) or not all(map(is_integer, values)):
+        raise ValueError('expected a list of integer ids')
+    ids = list(dict.fromkeys(values))
+    if not ids or len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f'expected 1 to {MAX_BATCH_IDS} ids')
+    return ids
+
+
+def delete_questions(ids):
+    """Delete the questions with these ids in one statement and commit.
+
+    Returns the ids that were deleted; ids with no question are ignored.
+    """
+    rows = db.session.execute(
+        delete(Question).where(Question.id.in_(ids)).returning(
+            *[getattr(Question, name) for name in QUESTION_COLUMNS])).all()
+    if rows:
+        bump_catalog_version(db.session.connection())
+    db.session.commit()
+
+    deleted = [format_question_row(row) for row in rows]
+    if deleted:
+        notify_question_change('delete', deleted)
+    return [question['id'] for question in deleted]
+
+
+def update_question(question_id, version, changes):
+    """Apply `changes` to a question still at `version` and commit.
+
+    A single UPDATE matches the id and the version and bumps the version,
+    so it changes nothing once someone else has updated the question.
+    Returns the updated question, or None when no row matched.
+    """
+    row = db.session.execute(
+        update(Question).where(
+            Question.id == question_id, Question.version == version).values(
+                **changes, version=Question.version + 1).returning(
+            *[getattr(Question, name) for name in QUESTION_COLUMNS])).first()
+    if row is not None:
+        bump_catalog_version(db.session.connection())
+    db.session.commit()
+
+    if row is None:
+        return None
+    question = format_question_row(row)
+    notify_question_change('update', [question])
+    return question
+
+
+def iter_question_lines(category=None, fields=QUESTION_COLUMNS):
+    """Yield every question, optionally of one category, as NDJSON lines.
+
+    Rows come from a server-side cursor in chunks of EXPORT_YIELD_PER, so
+    memory stays constant however large the table is.
+    """
+    selection = question_rows(fields).order_by(
+        Question.id).execution_options(yield_per=EXPORT_YIELD_PER)
+    if category is not None:
+        selection = selection.where(Question.category == category)
+
+    for row in db.session.execute(selection):
+        yield json.dumps(format_question_row(row, fields)) + '\n'
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import Category, read_catalog_version
+
+try:
+    import redis
+except ImportError:  # only needed for a cache shared between workers
+    redis = None
+
+
+class LocalCache:
+    """Thread-safe process-local key/value store with per-entry TTLs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Redis-backed store shared by every worker; values are JSON encoded."""
+
+    def __init__(self, url, prefix='trivia:'):
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._prefix + key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+
+def create_cache_backend(app):
+    """Return a RedisCache when CACHE_REDIS_URL is set, else a LocalCache."""
+    url = app.config.get('CACHE_REDIS_URL')
+    if not url:
+        return LocalCache()
+    if redis is None:
+        raise RuntimeError(
+            'CACHE_REDIS_URL is set but the redis package is not installed')
+    return RedisCache(url)
+
+
+class CategoryCache:
+    """Read-through cache of the category id -> type map.
+
+    Entries expire after `ttl` seconds and are dropped as soon as a
+    session commits a change to a Category row.
+    """
+
+    KEY = 'categories'
+
+    def __init__(self, backend, ttl=300):
+        self._backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def categories(self):
+        pairs = self._backend.get(self.KEY)
+        with self._lock:
+            if pairs is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if pairs is None:
+            pairs = [[category.id, category.type] for category in
+                     Category.query.order_by(Category.id).all()]
+            self._backend.set(self.KEY, pairs, self.ttl)
+
+        return {category_id: category_type
+                for category_id, category_type in pairs}
+
+    def category_type(self, category_id):
+        return self.categories().get(category_id)
+
+    def invalidate(self):
+        self._backend.delete(self.KEY)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': hits / lookups if lookups else None
+        }
+
+
+class CatalogVersion:
+    """Monotonically increasing version of the question and category data.
+
+    The version lives in the catalog_versions row that every write bumps
+    in its own transaction, so each worker reads the same version for the
+    same data and it makes a cheap validator for strong ETags on the read
+    routes. Reading it costs one primary-key lookup per request.
+    """
+
+    def current(self):
+        return read_catalog_version()
+
+    def etag(self, path):
+        key = f'{self.current()} {path}'.encode()
+        return hashlib.sha1(key).hexdigest()
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def _mark_categories_changed(mapper, connection, target):
+    object_session(target).info['categories_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_categories(session):
+    if not session.info.pop('categories_changed', False):
+        return
+    if has_app_context():
+        category_cache = current_app.extensions.get('category_cache')
+        if category_cache is not None:
+            category_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_category_changes(session):
+    session.info.pop('categories_changed', None)
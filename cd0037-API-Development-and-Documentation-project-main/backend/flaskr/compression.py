@@ -0,0 +1,92 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+
+# Brotli quality favouring speed; 11 compresses a little better but is
+# far too slow to run per request.
+BROTLI_QUALITY = 4
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_responses(app):
+    """Compress JSON and NDJSON responses with gzip or brotli.
+
+    The encoding is negotiated from Accept-Encoding, preferring brotli
+    when it is installed. Bodies under COMPRESS_MIN_SIZE bytes are sent
+    as they are; streamed bodies, whose size is unknown, are compressed
+    chunk by chunk. Register this before the hook that sets ETags: hooks
+    run in reverse order, so the ETag can then be made weak, as the
+    compressed bytes differ from the identity representation.
+    """
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def revalidated(response):
+        # A 304 stands in for the 200 the client cached, so it repeats that
+        # response's Vary and, when it was compressed, its weak ETag.
+        etag, weak = response.get_etag()
+        if etag is None:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (not weak and request.if_none_match.is_weak(etag) and
+                request.accept_encodings.best_match(encodings) is not None):
+            response.set_etag(etag, weak=True)
+        return response
+
+    @app.after_request
+    def compress(response):
+        if min_size >= 0 and response.status_code == 304:
+            return revalidated(response)
+        if (min_size < 0 or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code != 200):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None or 'Content-Encoding' in response.headers:
+            return response
+
+        if response.is_streamed:
+            chunks = response.iter_encoded()
+            response.response = (_brotli_stream(chunks) if encoding == 'br'
+                                 else _gzip_stream(chunks, level))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(
+                brotli.compress(data, quality=BROTLI_QUALITY)
+                if encoding == 'br' else gzip.compress(data, level))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
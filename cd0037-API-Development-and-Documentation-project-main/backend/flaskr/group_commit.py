@@ -0,0 +1,98 @@
+import threading
+import time
+
+from models import db
+from .bulk import write_questions
+
+
+class _Pending:
+    __slots__ = ('row', 'done', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommit:
+    """Coalesce concurrent question inserts into shared transactions.
+
+    The first request to arrive becomes the leader of a group. It waits
+    up to `window` seconds, or until `max_batch` rows are queued, then
+    writes every queued row with one multi-row INSERT and one commit on
+    its own session, while the other requests wait for their ids. When
+    the group's transaction fails, each row is retried in a transaction
+    of its own, so only the requests whose rows are bad see an error.
+    """
+
+    def __init__(self, window=0.005, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self._condition = threading.Condition()
+        self._pending = []
+        self._leading = False
+        self.batches = 0
+        self.rows = 0
+
+    def insert(self, row):
+        """Insert a question dict; returns its id or raises its error."""
+        entry = _Pending(dict(row))
+        with self._condition:
+            self._pending.append(entry)
+            leader = not self._leading
+            self._leading = True
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify_all()
+
+        if leader:
+            self._lead()
+        entry.done.wait()
+
+        # The row was written on the leader's session; pin this one to
+        # the primary as well so read-your-writes covers the caller.
+        db.session.info['primary'] = True
+        if entry.error is not None:
+            raise entry.error
+        return entry.row['id']
+
+    def _lead(self):
+        deadline = time.monotonic() + self.window
+        with self._condition:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            group, self._pending = self._pending, []
+            self._leading = False
+
+        try:
+            self._write(group)
+        finally:
+            for entry in group:
+                entry.done.set()
+
+    def _write(self, group):
+        try:
+            write_questions([entry.row for entry in group])
+            self._count(1, len(group))
+            return
+        except Exception:
+            db.session.rollback()
+
+        for entry in group:
+            try:
+                write_questions([entry.row])
+                self._count(1, 1)
+            except Exception as e:
+                db.session.rollback()
+                entry.error = e
+
+    def _count(self, batches, rows):
+        with self._condition:
+            self.batches += batches
+            self.rows += rows
+
+    def stats(self):
+        with self._condition:
+            return {'batches': self.batches, 'rows': self.rows}
@@ -0,0 +1,107 @@
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import render_histogram
+
+
+def instrument_app(app, metrics):
+    """Time every request of `app` and count the SQL it issues.
+
+    Register this before any other before_request hook so requests
+    answered early (such as a 304 from the ETag check) are measured too.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_started' in g:
+            metrics.observe(
+                request.endpoint or 'unmatched',
+                request.method,
+                response.status_code,
+                time.perf_counter() - g.metrics_started,
+                g.metrics_queries,
+                g.metrics_query_seconds,
+                None if response.is_streamed else response.content_length)
+        return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context,
+                       executemany):
+    if has_request_context() and 'metrics_started' in g:
+        conn.info.setdefault('metrics_query_started', []).append(
+            time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context,
+                  executemany):
+    started = conn.info.get('metrics_query_started')
+    if not started or not has_request_context() or 'metrics_started' not in g:
+        return
+    g.metrics_queries += 1
+    g.metrics_query_seconds += time.perf_counter() - started.pop()
+
+
+def render_gauges(name, description, values, kind='gauge'):
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+    lines.extend(f'{name} {value}' for value in values)
+    return lines
+
+
+def render_pool_metrics(stats):
+    if stats is None:
+        return []
+    lines = []
+    for key, name, description in (
+            ('checkedOut', 'trivia_db_pool_checked_out',
+             'Connections currently checked out of the pool.'),
+            ('checkedIn', 'trivia_db_pool_checked_in',
+             'Idle connections held by the pool.'),
+            ('overflow', 'trivia_db_pool_overflow',
+             'Overflow connections beyond the pool size.')):
+        lines.extend(render_gauges(name, description, [stats[key]]))
+    lines.extend(render_gauges(
+        'trivia_db_pool_timeouts_total',
+        'Checkouts that gave up waiting for a connection.',
+        [stats['timeouts']], kind='counter'))
+    lines.append('# HELP trivia_db_pool_checkout_seconds '
+                 'Time spent waiting for a pooled connection.')
+    lines.append('# TYPE trivia_db_pool_checkout_seconds histogram')
+    lines.extend(render_histogram('trivia_db_pool_checkout_seconds', {}, {
+        'buckets': stats['checkoutLatency'],
+        'sum': stats['waitSeconds'],
+        'count': stats['checkouts']}))
+    return lines
+
+
+def render_cache_metrics(caches):
+    lines = []
+    for kind in ('hits', 'misses'):
+        name = f'trivia_cache_{kind}_total'
+        lines.append(f'# HELP {name} Cache {kind} by cache.')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{{cache="{cache}"}} {stats[kind]}'
+                     for cache, stats in caches.items())
+    return lines
+
+
+def render_group_commit_metrics(stats):
+    if stats is None:
+        return []
+    return (render_gauges(
+        'trivia_group_commit_batches_total',
+        'Transactions written by the group-commit insert path.',
+        [stats['batches']], kind='counter') + render_gauges(
+        'trivia_group_commit_rows_total',
+        'Questions inserted by the group-commit insert path.',
+        [stats['rows']], kind='counter'))
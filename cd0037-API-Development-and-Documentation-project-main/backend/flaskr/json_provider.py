@@ -0,0 +1,43 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, responses fall back to the stdlib encoder
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes responses with orjson straight to bytes.
+
+    Keys are sorted and non-string keys (the category id maps) are
+    allowed, so the output matches the default provider's.
+    """
+
+    option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+              if orjson is not None else 0)
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default,
+                            option=self.option).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype)
+
+
+def create_json_provider(app):
+    """Return the provider named by JSON_PROVIDER ('auto' by default)."""
+    name = app.config.get('JSON_PROVIDER', 'auto')
+    if name == 'auto':
+        name = 'stdlib' if orjson is None else 'orjson'
+
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError(
+                'JSON_PROVIDER is orjson but orjson is not installed')
+        return OrjsonProvider(app)
+    if name == 'stdlib':
+        return DefaultJSONProvider(app)
+    raise ValueError(f'Unknown JSON_PROVIDER: {name}')
@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+class LiveIndex:
+    """In-process state loaded from the database and kept current by writes.
+
+    Subclasses implement `_load()`, which reads the database and returns
+    a new state without touching the index, `_install(state)`, and
+    `_apply(action, questions)` for the question listeners; the last two
+    run under `_lock`. `_apply` returns False for a write it cannot
+    apply, and the index reloads on next use instead.
+
+    The state is loaded on first use and reloaded once older than
+    `max_age` seconds, to pick up other workers' writes. A write applied
+    while a reload reads the database may be missing from what it read,
+    so it is replayed onto the new state before that is installed. An
+    index whose `_apply` is not `idempotent` cannot replay a write the
+    reload may already have seen; it installs the new state but reloads
+    again on next use, as it does after an `invalidate()` that races it.
+    """
+
+    idempotent = True
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        # One list per reload in progress, collecting the writes it races.
+        self._reloads = []
+        self._invalidations = 0
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _install(self, state):
+        raise NotImplementedError
+
+    def _apply(self, action, questions):
+        raise NotImplementedError
+
+    def rebuild(self):
+        pending = []
+        with self._lock:
+            self._reloads.append(pending)
+            invalidations = self._invalidations
+        try:
+            state = self._load()
+        except BaseException:
+            with self._lock:
+                self._reloads.remove(pending)
+            raise
+
+        with self._lock:
+            self._reloads.remove(pending)
+            self._install(state)
+            self._loaded_at = time.monotonic()
+            if invalidations != self._invalidations or (
+                    pending and not self.idempotent):
+                self._loaded_at = None
+                return
+            for action, questions in pending:
+                if self._apply(action, questions) is False:
+                    self._loaded_at = None
+                    return
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or (
+                self.max_age is not None and
+                time.monotonic() - self._loaded_at > self.max_age):
+            self.rebuild()
+
+    def apply(self, action, questions):
+        with self._lock:
+            for pending in self._reloads:
+                pending.append((action, questions))
+            if self._loaded_at is None:
+                return
+            if self._apply(action, questions) is False:
+                self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._invalidations += 1
+            self._loaded_at = None
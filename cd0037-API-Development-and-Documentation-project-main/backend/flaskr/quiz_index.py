@@ -0,0 +1,150 @@
+import random
+from array import array
+
+from models import db, Question
+from .live_index import LiveIndex
+from .search import fetch_in_order
+
+# Random probes tried against the excluded set before falling back to
+# scanning the candidates that are still allowed.
+MAX_REJECTIONS = 16
+
+# Most questions one quiz round may prefetch.
+MAX_DRAW = 50
+
+
+class QuizIndex(LiveIndex):
+    """In-memory map of category id to a compact array of question ids.
+
+    Draws sample ids from the arrays and fetch just those rows by primary
+    key, so the cost of a quiz round no longer grows with the catalog or
+    with the number of previous questions. The index is loaded from the
+    database on first use and reloaded once it is older than `max_age`
+    seconds; writes made through `Question.insert`/`update`/`delete`
+    are applied immediately, each in constant time.
+    """
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._by_category = {}
+        # Question id to (category, position in its array), so a delete
+        # or update moves one id instead of scanning every array.
+        self._positions = {}
+        # Decks handed out since the last write, shared by quiz sessions.
+        self._decks = {}
+
+    def _load(self):
+        rows = db.session.query(Question.id, Question.category).all()
+        by_category, positions = {}, {}
+        for question_id, category in rows:
+            ids = by_category.setdefault(int(category), array('q'))
+            positions[question_id] = (int(category), len(ids))
+            ids.append(question_id)
+        return by_category, positions
+
+    def _install(self, state):
+        self._by_category, self._positions = state
+        self._decks = {}
+
+    def _apply(self, action, questions):
+        for question in questions:
+            if question['id'] in self._positions:
+                self._discard(question['id'])
+            if action != 'delete':
+                self._add(question['id'], int(question['category']))
+
+    def _add(self, question_id, category):
+        self._decks = {}
+        ids = self._by_category.setdefault(category, array('q'))
+        self._positions[question_id] = (category, len(ids))
+        ids.append(question_id)
+
+    def _discard(self, question_id):
+        entry = self._positions.pop(question_id, None)
+        if entry is None:
+            return
+        self._decks = {}
+        category, position = entry
+        ids = self._by_category[category]
+        last = ids.pop()
+        if position < len(ids):
+            ids[position] = last
+            self._positions[last] = (category, position)
+
+    def _pick_id(self, category_id, excluded):
+        with self._lock:
+            if category_id:
+                pools = [self._by_category.get(category_id, array('q'))]
+            else:
+                pools = list(self._by_category.values())
+            total = sum(len(ids) for ids in pools)
+            if total == 0:
+                return None
+
+            for _ in range(MAX_REJECTIONS):
+                position = random.randrange(total)
+                for ids in pools:
+                    if position < len(ids):
+                        candidate = ids[position]
+                        break
+                    position -= len(ids)
+                if candidate not in excluded:
+                    return candidate
+
+            remaining = [question_id for ids in pools for question_id in ids
+                         if question_id not in excluded]
+        return random.choice(remaining) if remaining else None
+
+    def deck(self, category_id=0):
+        """Return the ids of a category (0 for all) as a read-only array.
+
+        Callers until the next write share one copy, which they must not
+        modify.
+        """
+        self._ensure_loaded()
+        category_id = int(category_id)
+        with self._lock:
+            deck = self._decks.get(category_id)
+            if deck is None:
+                if category_id:
+                    deck = array('q', self._by_category.get(category_id, ()))
+                else:
+                    deck = array('q')
+                    for ids in self._by_category.values():
+                        deck.extend(ids)
+                self._decks[category_id] = deck
+        return deck
+
+    def draw(self, category_id=0, excluded=(), count=1):
+        """Return up to `count` distinct random question rows.
+
+        Questions in `excluded` are never drawn. The rows are fetched with
+        one IN query; fewer than `count` come back only when the category
+        runs out of questions.
+        """
+        self._ensure_loaded()
+        excluded = {int(question_id) for question_id in excluded}
+        category_id = int(category_id)
+
+        rows = []
+        while len(rows) < count:
+            question_ids = []
+            for _ in range(count - len(rows)):
+                question_id = self._pick_id(category_id, excluded)
+                if question_id is None:
+                    break
+                excluded.add(question_id)
+                question_ids.append(question_id)
+            if not question_ids:
+                break
+
+            fetched = fetch_in_order(question_ids)
+            rows.extend(fetched)
+            if len(fetched) < len(question_ids):
+                # Deleted by another worker since the index was loaded.
+                found = {row.id for row in fetched}
+                with self._lock:
+                    for question_id in question_ids:
+                        if question_id not in found:
+                            self._discard(question_id)
+        return rows
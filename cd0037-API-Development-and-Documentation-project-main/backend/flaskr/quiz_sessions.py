@@ -0,0 +1,116 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Feistel rounds of the per-session shuffle.
+SHUFFLE_ROUNDS = 4
+
+
+def shuffled_position(index, size, keys):
+    """Map `index` to its place in a random permutation of range(size).
+
+    A Feistel network over the smallest even number of bits covering
+    `size` is a permutation of that power-of-two domain; positions that
+    land outside range(size) are walked through it again until they fall
+    inside, which keeps the mapping a permutation of range(size). `keys`
+    picks the permutation, one per Feistel round.
+    """
+    half = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    while True:
+        left, right = index >> half, index & mask
+        for key in keys:
+            mixed = ((right + key) * 0x9E3779B97F4A7C15) >> 29
+            left, right = right, left ^ (mixed & mask)
+        index = (left << half) | right
+        if index < size:
+            return index
+
+
+class QuizSessionStore:
+    """Bounded process-local store of quiz sessions keyed by random tokens.
+
+    A session is a deck of question ids, the keys of a random permutation
+    of it and a cursor, so serving the next question maps one position
+    instead of excluding every question already played. The deck is not
+    copied or shuffled: sessions started from the same deck share it.
+    Sessions are kept in least-recently-used order: an
+    idle session expires `ttl` seconds after its last use, and the least
+    recently used one is evicted once more than `max_sessions` are open.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=1800):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now):
+        # Sliding expiry keeps the oldest deadline at the front.
+        while self._sessions:
+            token, entry = next(iter(self._sessions.items()))
+            if entry[0] > now:
+                break
+            del self._sessions[token]
+            self.evictions += 1
+
+    def create(self, deck):
+        """Open a session over `deck` and return its token.
+
+        The deck must not be modified while the session is open.
+        """
+        token = secrets.token_urlsafe(16)
+        keys = tuple(random.getrandbits(64) for _ in range(SHUFFLE_ROUNDS))
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._sessions[token] = [now + self.ttl, deck, keys, 0]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return token
+
+    def pop(self, token):
+        """Return (next question id or None, ids left) for a session.
+
+        Raises KeyError when the token is unknown or has expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(token)
+            if entry is None:
+                self.misses += 1
+                raise KeyError(token)
+            self.hits += 1
+            self._sessions.move_to_end(token)
+            entry[0] = now + self.ttl
+            _, deck, keys, dealt = entry
+            if dealt == len(deck):
+                return None, 0
+            entry[3] = dealt + 1
+            position = shuffled_position(dealt, len(deck), keys)
+            return deck[position], len(deck) - dealt - 1
+
+    def delete(self, token):
+        """End a session; returns whether it was open."""
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            size, evictions = len(self._sessions), self.evictions
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': hits / lookups if lookups else None,
+            'size': size,
+            'evictions': evictions
+        }
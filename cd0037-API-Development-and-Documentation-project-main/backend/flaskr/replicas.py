@@ -0,0 +1,46 @@
+import time
+
+from flask import g, request
+
+from models import db
+
+# Cookie holding the time until which a client that wrote reads from the
+# primary, so it sees its own writes despite replication lag.
+PRIMARY_COOKIE = 'read_primary_until'
+
+
+def route_reads(app, endpoints):
+    """Pick the replica that serves the SELECTs of requests to `endpoints`.
+
+    One replica is picked per request, so the reads of a page, its count
+    and its ETag version never come from replicas at different points
+    of replication. Does nothing unless replicas are configured. With DB_READ_YOUR_WRITES
+    set, a response to a request that wrote carries a cookie that keeps
+    the client's reads on the primary for that many seconds.
+    """
+    if 'replica_router' not in app.extensions:
+        return
+    router = app.extensions['replica_router']
+    window = app.config['DB_READ_YOUR_WRITES']
+
+    @app.before_request
+    def choose_read_bind():
+        if request.endpoint not in endpoints:
+            return
+        if window:
+            try:
+                primary_until = float(request.cookies.get(PRIMARY_COOKIE, 0))
+            except ValueError:
+                primary_until = 0
+            if primary_until > time.time():
+                return
+        # None when no replica is healthy: the request reads the primary.
+        g.read_replica = router.pick()
+
+    @app.after_request
+    def remember_write(response):
+        if window and db.session.info.get('primary'):
+            response.set_cookie(
+                PRIMARY_COOKIE, str(time.time() + window),
+                max_age=int(window) + 1, httponly=True)
+        return response
@@ -0,0 +1,151 @@
+import re
+from collections import Counter
+
+from sqlalchemy import desc, func, literal_column, or_
+
+from models import (db, question_rows, search_document,
+                    Question, QUESTION_COLUMNS)
+from .live_index import LiveIndex
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def fetch_in_order(question_ids, fields=QUESTION_COLUMNS):
+    """Load question rows by id with one IN query, keeping the given order.
+
+    `fields` must include 'id'.
+    """
+    if not question_ids:
+        return []
+    rows = db.session.execute(
+        question_rows(fields).where(Question.id.in_(question_ids)))
+    by_id = {row.id: row for row in rows}
+    return [by_id[question_id] for question_id in question_ids
+            if question_id in by_id]
+
+
+class SubstringSearch:
+    """Case-insensitive substring match ordered by id (the original search)."""
+
+    def query(self, term, answers=False, fields=QUESTION_COLUMNS):
+        pattern = f'%{term}%'
+        condition = Question.question.ilike(pattern)
+        if answers:
+            condition = or_(condition, Question.answer.ilike(pattern))
+        return question_rows(fields).where(condition).order_by(Question.id)
+
+    def ranked_ids(self, term, answers=False):
+        return db.session.scalars(self.query(term, answers, ('id',))).all()
+
+
+class PostgresSearch:
+    """Ranked full-text search on tsvector expressions backed by GIN indexes."""
+
+    def query(self, term, answers=False, fields=QUESTION_COLUMNS):
+        document = search_document(
+            Question.question, Question.answer if answers else None)
+        query = func.plainto_tsquery(literal_column("'english'"), term)
+        return question_rows(fields).where(document.op('@@')(query)).order_by(
+            desc(func.ts_rank(document, query)), Question.id)
+
+    def ranked_ids(self, term, answers=False):
+        return db.session.scalars(self.query(term, answers, ('id',))).all()
+
+
+class InvertedIndexSearch(LiveIndex):
+    """Pure-Python inverted index for databases without full-text search.
+
+    Maps each lower-cased word to the ids of the questions (and,
+    separately, answers) containing it. Every word of the search term must
+    match; results are ranked by how often the words occur, then by id.
+    Loaded on first search, kept current through question listeners and
+    reloaded once older than `max_age` seconds to pick up other workers'
+    writes.
+    """
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._postings = {'question': {}, 'answer': {}}
+        self._documents = {}
+
+    def _load(self):
+        return db.session.query(
+            Question.id, Question.question, Question.answer).all()
+
+    def _install(self, rows):
+        self._postings = {'question': {}, 'answer': {}}
+        self._documents = {}
+        for question_id, question, answer in rows:
+            self._add(question_id, question, answer)
+
+    def _add(self, question_id, question, answer):
+        document = {'question': Counter(tokenize(question)),
+                    'answer': Counter(tokenize(answer))}
+        self._documents[question_id] = document
+        for field, counts in document.items():
+            postings = self._postings[field]
+            for token, count in counts.items():
+                postings.setdefault(token, {})[question_id] = count
+
+    def _remove(self, question_id):
+        document = self._documents.pop(question_id, None)
+        if document is None:
+            return
+        for field, counts in document.items():
+            for token in counts:
+                postings = self._postings[field][token]
+                postings.pop(question_id, None)
+                if not postings:
+                    del self._postings[field][token]
+
+    def _apply(self, action, questions):
+        for question in questions:
+            self._remove(question['id'])
+            if action != 'delete':
+                self._add(question['id'], question['question'],
+                          question['answer'])
+
+    def ranked_ids(self, term, answers=False):
+        self._ensure_loaded()
+
+        fields = ['question', 'answer'] if answers else ['question']
+        scores = None
+        with self._lock:
+            for token in set(tokenize(term)):
+                token_scores = Counter()
+                for field in fields:
+                    token_scores.update(
+                        self._postings[field].get(token, {}))
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = Counter({
+                        question_id: score + token_scores[question_id]
+                        for question_id, score in scores.items()
+                        if question_id in token_scores})
+                if not scores:
+                    return []
+
+        if not scores:
+            return []
+        return sorted(scores, key=lambda question_id: (
+            -scores[question_id], question_id))
+
+
+def create_search_engine(app, database_uri):
+    """Pick the full-text engine for SEARCH_BACKEND ('auto' by default)."""
+    backend = app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = ('postgresql' if database_uri and
+                   database_uri.startswith('postgresql') else 'memory')
+
+    if backend == 'postgresql':
+        return PostgresSearch()
+    if backend == 'memory':
+        return InvertedIndexSearch(
+            max_age=app.config.get('SEARCH_INDEX_MAX_AGE', 300))
+    raise ValueError(f'Unknown SEARCH_BACKEND: {backend}')
@@ -0,0 +1,90 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+
+def normalize_term(term, mode):
+    """Fold the spellings of a search term that match the same questions.
+
+    Both modes ignore case; full-text search also ignores how the words
+    are spaced, while a substring match must keep the spaces as typed.
+    """
+    term = term.lower()
+    if mode == 'fulltext':
+        term = ' '.join(term.split())
+    return term
+
+
+class SearchResultCache:
+    """Bounded LRU of search results: the ordered ids matching a term.
+
+    Entries are keyed by the search mode, whether answers are searched
+    and the normalized term, and hold every matching id in result order,
+    so any page of a popular term is a slice of the cached ids plus one
+    primary-key lookup. Each entry remembers the catalog version it was
+    computed at and is dropped on lookup once a write by any worker has
+    moved the version on. Past `max_entries` entries or `max_bytes` of ids the
+    least recently used are evicted; larger results are not cached.
+    """
+
+    def __init__(self, catalog_version, max_entries=1000,
+                 max_bytes=16 * 1024 * 1024):
+        self.catalog_version = catalog_version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ids(self, key, compute):
+        """Return the ids cached for `key`, or cache and return compute()."""
+        # Read before computing, so a write landing meanwhile leaves the
+        # new entry stale instead of serving it as current.
+        version = self.catalog_version.current()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self._discard(key)
+
+        ids = array('q', compute())
+        size = ids.itemsize * len(ids)
+        if size > self.max_bytes or not self.max_entries:
+            return ids
+
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (version, ids)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries or
+                   self._bytes > self.max_bytes):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return ids
+
+    def _discard(self, key):
+        _, ids = self._entries.pop(key)
+        self._bytes -= ids.itemsize * len(ids)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            size, used, evictions = (
+                len(self._entries), self._bytes, self.evictions)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': hits / lookups if lookups else None,
+            'size': size,
+            'bytes': used,
+            'evictions': evictions
+        }
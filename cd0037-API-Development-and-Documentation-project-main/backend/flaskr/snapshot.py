@@ -0,0 +1,247 @@
+import bisect
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+import threading
+from array import array
+
+from models import (db, question_rows, read_catalog_version, Question,
+                    QUESTION_COLUMNS)
+from .bulk import EXPORT_YIELD_PER
+from .quiz_index import MAX_REJECTIONS
+
+try:
+    import fcntl
+except ImportError:  # regenerations are not serialized between processes
+    fcntl = None
+
+MAGIC = b'TRIVIA03'
+
+# Magic, question count N and the catalog version the snapshot was read
+# at. The header is followed by int64 columns in
+# native byte order, each indexed by position (questions ordered by id):
+#   ids, categories, difficulties,
+#   versions                        N values each
+#   by_category                     N positions ordered by (category, id)
+#   text_offsets                    2N + 1 offsets into the text blob, the
+#                                   question of position p at 2p, its
+#                                   answer at 2p + 1
+# and then the blob of UTF-8 texts.
+HEADER = struct.Struct('=8sqq')
+
+SNAPSHOT_COLUMNS = ('id', 'question', 'answer', 'category', 'difficulty',
+                    'version')
+
+
+def write_snapshot(file, rows, catalog_version=0, directory=None):
+    """Write rows of the SNAPSHOT_COLUMNS, ordered by id.
+
+    Only the int64 columns are held in memory; the texts are spooled to a
+    temporary file in `directory` and copied after them.
+    """
+    ids, categories, difficulties, versions = (
+        array('q'), array('q'), array('q'), array('q'))
+    text_offsets, blob_size = array('q', [0]), 0
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        for (question_id, question, answer, category, difficulty,
+             version) in rows:
+            ids.append(question_id)
+            categories.append(category)
+            difficulties.append(difficulty)
+            versions.append(version)
+            for text in (question, answer):
+                blob_size += blob.write(text.encode('utf-8'))
+                text_offsets.append(blob_size)
+        by_category = array('q', sorted(range(len(ids)),
+                                        key=categories.__getitem__))
+
+        file.write(HEADER.pack(MAGIC, len(ids), catalog_version))
+        for column in (ids, categories, difficulties, versions, by_category,
+                       text_offsets):
+            column.tofile(file)
+        blob.seek(0)
+        shutil.copyfileobj(blob, file)
+
+
+class Snapshot:
+    """Read-only view of one snapshot file, mapped into memory.
+
+    The columns are memoryviews over the map, so every worker mapping the
+    same file shares one copy of it in the page cache and a read only
+    decodes the texts of the rows it returns.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, self.count, self.catalog_version = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+
+        offset = HEADER.size
+        columns = []
+        for length in (self.count,) * 5 + (2 * self.count + 1,):
+            end = offset + length * 8
+            columns.append(view[offset:end].cast('q'))
+            offset = end
+        (self.ids, self.categories, self.difficulties, self.versions,
+         self.by_category, self.text_offsets) = columns
+        self._numbers = {'id': self.ids, 'category': self.categories,
+                         'difficulty': self.difficulties,
+                         'version': self.versions}
+        self._blob = view[offset:]
+
+    def _text(self, index):
+        return str(self._blob[self.text_offsets[index]:
+                              self.text_offsets[index + 1]], 'utf-8')
+
+    def question(self, position, fields=QUESTION_COLUMNS):
+        """Return the `Question.format()` dict of the row at `position`."""
+        row = {}
+        for name in fields:
+            if name == 'question':
+                row[name] = self._text(2 * position)
+            elif name == 'answer':
+                row[name] = self._text(2 * position + 1)
+            else:
+                row[name] = self._numbers[name][position]
+        return row
+
+    def _category_span(self, category):
+        key = self.categories.__getitem__
+        return (bisect.bisect_left(self.by_category, category, key=key),
+                bisect.bisect_right(self.by_category, category, key=key))
+
+    def positions(self, category=None):
+        """Positions of a category's questions (all if None), by id."""
+        if category is None:
+            return range(self.count)
+        start, end = self._category_span(category)
+        return self.by_category[start:end]
+
+    def page(self, category=None, offset=0, limit=10, after_id=None):
+        """Positions of one page, by offset or after an id cursor."""
+        positions = self.positions(category)
+        if after_id is not None:
+            offset = bisect.bisect_right(
+                positions, after_id, key=self.ids.__getitem__)
+        return positions[offset:offset + limit]
+
+    def total(self, category=None):
+        return len(self.positions(category))
+
+    def draw(self, category=0, excluded=(), count=1):
+        """Return up to `count` distinct random positions.
+
+        Questions whose ids are in `excluded` are never drawn. Random
+        probes are tried first, then the remaining candidates are
+        scanned, as in QuizIndex.
+        """
+        pool = self.positions(category or None)
+        excluded = {int(question_id) for question_id in excluded}
+        drawn = []
+        for _ in range(MAX_REJECTIONS * count):
+            if len(drawn) == count or not pool:
+                break
+            position = pool[random.randrange(len(pool))]
+            if self.ids[position] not in excluded:
+                excluded.add(self.ids[position])
+                drawn.append(position)
+        if len(drawn) < count:
+            remaining = [position for position in pool
+                         if self.ids[position] not in excluded]
+            drawn.extend(random.sample(
+                remaining, min(count - len(drawn), len(remaining))))
+        return drawn
+
+
+class CatalogSnapshot:
+    """Questions served from a snapshot file shared by every worker.
+
+    The snapshot records the catalog version it was read at. Writes only
+    bump the version, so a bulk import costs nothing here; the first read
+    after them, in whichever worker, finds the snapshot older than the
+    catalog and regenerates it once. A regeneration writes a new file
+    beside the old one and renames it into place, so readers map either
+    the old or the new catalog, never a partial one. Every worker notices
+    the rename with one stat() per read and maps the new file; requests
+    still holding the old map keep reading it until they finish.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _on_disk_version(self):
+        try:
+            return Snapshot(self.path).catalog_version
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def regenerate(self, catalog_version=None):
+        """Write the current questions to a new snapshot and swap it in.
+
+        With `catalog_version`, a snapshot already at least that new is
+        kept, so workers that find the same snapshot stale rewrite it once.
+        """
+        selection = question_rows(SNAPSHOT_COLUMNS).order_by(
+            Question.id).execution_options(yield_per=EXPORT_YIELD_PER)
+        directory, name = os.path.split(self.path)
+
+        # Serialized across processes so a snapshot read before another
+        # worker's commit can never replace the one that includes it.
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if catalog_version is not None:
+                on_disk = self._on_disk_version()
+                if on_disk is not None and on_disk >= catalog_version:
+                    return
+            # Read before the rows: a write committed in between makes
+            # the snapshot look older than it is, never newer.
+            version = read_catalog_version()
+            descriptor, temporary = tempfile.mkstemp(
+                dir=directory, prefix=f'.{name}.')
+            try:
+                with os.fdopen(descriptor, 'wb') as file:
+                    write_snapshot(file, db.session.execute(selection),
+                                   version, directory)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+    def current(self):
+        """Return the mapped snapshot, regenerating it if stale."""
+        version = read_catalog_version()
+        snapshot = self._mapped()
+        if snapshot is None or snapshot.catalog_version < version:
+            self.regenerate(version)
+            snapshot = self._mapped()
+        return snapshot
+
+    def _mapped(self):
+        """Map the file if it changed since the last read, else reuse."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or (
+                    snapshot.stat.st_ino, snapshot.stat.st_mtime_ns) != (
+                    stat.st_ino, stat.st_mtime_ns):
+                try:
+                    snapshot = self._snapshot = Snapshot(self.path)
+                except ValueError:  # written by an older release
+                    return None
+            return snapshot
@@ -0,0 +1,109 @@
+from collections import Counter
+
+from sqlalchemy import func, select, text
+
+from models import db, question_count_rows, question_counts
+from .live_index import LiveIndex
+
+
+def summarize(counts):
+    """Roll {(category, difficulty): count} up for GET /stats."""
+    by_category, by_difficulty, breakdown = Counter(), Counter(), {}
+    for (category, difficulty), count in sorted(counts.items()):
+        by_category[category] += count
+        by_difficulty[difficulty] += count
+        breakdown.setdefault(category, {})[difficulty] = count
+    return {
+        'totalQuestions': sum(by_category.values()),
+        'byCategory': dict(by_category),
+        'byDifficulty': dict(by_difficulty),
+        'byCategoryAndDifficulty': breakdown
+    }
+
+
+class TriggerStats:
+    """Counters kept in the question_counts table by PostgreSQL triggers.
+
+    The triggers update the counters in the same transaction as the
+    write, so every worker reads exact counts with a lookup in a table of
+    a few dozen rows.
+    """
+
+    def counts(self):
+        rows = db.session.execute(
+            select(question_counts).where(question_counts.c.count != 0))
+        return {(category, difficulty): count
+                for category, difficulty, count in rows}
+
+    def total(self, category=None):
+        selection = select(func.coalesce(func.sum(question_counts.c.count), 0))
+        if category is not None:
+            selection = selection.where(question_counts.c.category == category)
+        return int(db.session.scalar(selection))
+
+    def rebuild(self):
+        """Recount every group, e.g. after writes that bypassed triggers."""
+        db.session.execute(text('LOCK TABLE questions IN SHARE MODE'))
+        db.session.execute(question_counts.delete())
+        db.session.execute(question_counts.insert().from_select(
+            ['category', 'difficulty', 'count'], question_count_rows()))
+        db.session.commit()
+
+
+class CounterStats(LiveIndex):
+    """Process-local counters for databases without the triggers.
+
+    Loaded with one GROUP BY on first use, then adjusted by question
+    listeners on every insert and delete; an update may move a question
+    between groups, so it triggers a reload instead. Counters older than
+    `max_age` seconds are reloaded to pick up other workers' writes.
+    """
+
+    # A step counted twice would skew the totals.
+    idempotent = False
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._counts = Counter()
+
+    def _load(self):
+        rows = db.session.execute(question_count_rows())
+        return Counter({(category, difficulty): count
+                        for category, difficulty, count in rows})
+
+    def _install(self, counts):
+        self._counts = counts
+
+    def _apply(self, action, questions):
+        if action == 'update':
+            return False
+        step = -1 if action == 'delete' else 1
+        for question in questions:
+            key = (int(question['category']),
+                   int(question['difficulty']))
+            self._counts[key] += step
+            if not self._counts[key]:
+                del self._counts[key]
+
+    def counts(self):
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._counts)
+
+    def total(self, category=None):
+        return sum(count for (group, _), count in self.counts().items()
+                   if category is None or group == category)
+
+
+def create_stats(app, database_uri):
+    """Pick the counters for STATS_BACKEND ('auto' by default)."""
+    backend = app.config.get('STATS_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = ('triggers' if database_uri and
+                   database_uri.startswith('postgresql') else 'memory')
+
+    if backend == 'triggers':
+        return TriggerStats()
+    if backend == 'memory':
+        return CounterStats(max_age=app.config.get('STATS_MAX_AGE', 300))
+    raise ValueError(f'Unknown STATS_BACKEND: {backend}')
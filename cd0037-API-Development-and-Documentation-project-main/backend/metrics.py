@@ -0,0 +1,119 @@
+import bisect
+import threading
+
+# Upper bounds, in seconds, shared by the latency histograms.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return cumulative bucket counts keyed by upper bound, sum, count."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'sum': total, 'count': count}
+
+
+# Upper bounds for SQL statements per request and response sizes.
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def render_histogram(name, labels, snapshot):
+    """Return Prometheus exposition lines for one histogram series."""
+    lines = [f'{name}_bucket{_labels(**labels, le=bound)} {count}'
+             for bound, count in snapshot['buckets'].items()]
+    lines.append(f'{name}_sum{_labels(**labels)} {snapshot["sum"]}')
+    lines.append(f'{name}_count{_labels(**labels)} {snapshot["count"]}')
+    return lines
+
+
+class RequestMetrics:
+    """Per-endpoint request latency, SQL usage and response size metrics."""
+
+    HISTOGRAMS = (
+        ('trivia_request_duration_seconds',
+         'Request latency by endpoint.', LATENCY_BUCKETS),
+        ('trivia_request_queries',
+         'SQL statements executed per request.', QUERY_COUNT_BUCKETS),
+        ('trivia_request_query_duration_seconds',
+         'Time spent in SQL statements per request.', LATENCY_BUCKETS),
+        ('trivia_response_size_bytes',
+         'Response body size, when known up front.', SIZE_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name, _, _ in self.HISTOGRAMS}
+        self._requests = {}
+
+    def _histogram(self, name, key, buckets):
+        series = self._histograms[name]
+        histogram = series.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = series.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def observe(self, endpoint, method, status, seconds, queries,
+                query_seconds, size=None):
+        key = (endpoint, method)
+        values = (seconds, queries, query_seconds, size)
+        for (name, _, buckets), value in zip(self.HISTOGRAMS, values):
+            if value is not None:
+                self._histogram(name, key, buckets).observe(value)
+
+        with self._lock:
+            request_key = (endpoint, method, status)
+            self._requests[request_key] = self._requests.get(
+                request_key, 0) + 1
+
+    def render(self):
+        lines = ['# HELP trivia_requests_total Requests by endpoint and '
+                 'status.',
+                 '# TYPE trivia_requests_total counter']
+        with self._lock:
+            requests = sorted(self._requests.items())
+            series = {name: sorted(histograms.items())
+                      for name, histograms in self._histograms.items()}
+        for (endpoint, method, status), count in requests:
+            labels = _labels(endpoint=endpoint, method=method, status=status)
+            lines.append(f'trivia_requests_total{labels} {count}')
+
+        for name, description, _ in self.HISTOGRAMS:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (endpoint, method), histogram in series[name]:
+                lines.extend(render_histogram(
+                    name, {'endpoint': endpoint, 'method': method},
+                    histogram.snapshot()))
+        return lines
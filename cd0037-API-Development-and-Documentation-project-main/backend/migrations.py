@@ -0,0 +1,121 @@
+"""Versioned schema migrations for existing trivia databases.
+
+`db.create_all()` only creates missing tables: it never adds an index
+or a trigger to a table that already exists, such as one restored from
+trivia.psql. Each migration below brings such a database one step
+closer to the models. Applied versions are recorded in the
+schema_migrations table and every step only creates what is missing, so
+`flask migrate` is safe on a database made by create_all as well.
+
+Add a migration by appending a function decorated with a new, higher
+version number; never edit one that has shipped.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table,
+                        inspect, select, text)
+
+from models import (CATALOG_VERSION_ROW, Category, Question, catalog_versions,
+                    question_count_rows, question_counts, question_counts_ddl)
+
+MIGRATIONS = []
+
+# Kept out of db.metadata so create_all never stamps a database as
+# migrated; `upgrade` creates it on first use.
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime(timezone=True), nullable=False))
+
+
+def migration(version, description):
+    def register(step):
+        MIGRATIONS.append((version, description, step))
+        return step
+    return register
+
+
+def create_question_indexes(connection, *names):
+    """Create the named indexes declared on Question unless they exist."""
+    indexes = {index.name: index for index in Question.__table__.indexes}
+    for name in names:
+        # Honours ddl_if, so PostgreSQL-only indexes are skipped elsewhere.
+        indexes[name].create(connection, checkfirst=True)
+
+
+@migration(1, 'categories and questions tables')
+def create_tables(connection):
+    Category.__table__.create(connection, checkfirst=True)
+    Question.__table__.create(connection, checkfirst=True)
+
+
+@migration(2, 'index questions.category and (category, id)')
+def index_question_category(connection):
+    create_question_indexes(
+        connection, 'ix_questions_category', 'ix_questions_category_id')
+
+
+@migration(3, 'full-text search indexes')
+def index_question_search(connection):
+    create_question_indexes(
+        connection,
+        'ix_questions_question_tsv', 'ix_questions_question_answer_tsv')
+
+
+@migration(4, 'question counters')
+def create_question_counts(connection):
+    question_counts.create(connection, checkfirst=True)
+    if connection.dialect.name == 'postgresql':
+        for statement in question_counts_ddl():
+            connection.execute(text(statement))
+    connection.execute(question_counts.delete())
+    connection.execute(question_counts.insert().from_select(
+        ['category', 'difficulty', 'count'], question_count_rows()))
+
+
+@migration(5, 'questions.version for optimistic concurrency')
+def add_question_version(connection):
+    columns = {column['name']
+               for column in inspect(connection).get_columns('questions')}
+    if 'version' not in columns:
+        connection.execute(text(
+            'ALTER TABLE questions ADD COLUMN version INTEGER NOT NULL '
+            'DEFAULT 1'))
+
+
+@migration(6, 'catalog version for ETags and cache validation')
+def create_catalog_versions(connection):
+    catalog_versions.create(connection, checkfirst=True)
+    if connection.scalar(select(catalog_versions.c.version)) is None:
+        connection.execute(text(CATALOG_VERSION_ROW))
+
+
+def applied_versions(engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.scalars(select(schema_migrations.c.version)))
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [(version, description)
+            for version, description, _ in sorted(MIGRATIONS)
+            if version not in applied]
+
+
+def upgrade(engine):
+    """Apply pending migrations in order, one transaction each.
+
+    Returns the (version, description) pairs that were applied.
+    """
+    steps = {version: step for version, _, step in MIGRATIONS}
+    applied = []
+    for version, description in pending_migrations(engine):
+        with engine.begin() as connection:
+            steps[version](connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, description=description,
+                applied_at=datetime.now(timezone.utc)))
+        applied.append((version, description))
+    return applied
@@ -6,3 +6,113 @@ load_dotenv()
 DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
+
+# Database URI; unset means the PostgreSQL database named by the DB_*
+# variables above. A sqlite:/// URI runs the API on an embedded database
+# whose connections are tuned with the SQLITE_* settings below: a WAL
+# journal so readers never block the writer, NORMAL syncing (durable
+# except across power loss), SQLITE_MMAP_SIZE bytes of memory-mapped
+# reads and a page cache of SQLITE_CACHE_SIZE (KiB when negative).
+DATABASE_URL = os.environ.get("DATABASE_URL")
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 268435456))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -65536))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+
+# Seconds before the in-memory quiz index is reloaded from the database,
+# so questions written by other worker processes are eventually drawn.
+QUIZ_INDEX_MAX_AGE = int(os.environ.get("QUIZ_INDEX_MAX_AGE", 300))
+
+# Quiz sessions (POST /quizzes/sessions) are held in process: idle ones
+# expire after QUIZ_SESSION_TTL seconds, and beyond QUIZ_SESSION_MAX open
+# sessions the least recently used is dropped.
+QUIZ_SESSION_TTL = int(os.environ.get("QUIZ_SESSION_TTL", 1800))
+QUIZ_SESSION_MAX = int(os.environ.get("QUIZ_SESSION_MAX", 10000))
+
+# GET /questions/autocomplete serves prefixes from an in-process index of
+# question words, reloaded after AUTOCOMPLETE_MAX_AGE seconds. The best
+# suggestions of prefixes up to AUTOCOMPLETE_CACHE_DEPTH characters long
+# are cached, since those span the most words.
+AUTOCOMPLETE_MAX_AGE = int(os.environ.get("AUTOCOMPLETE_MAX_AGE", 300))
+AUTOCOMPLETE_CACHE_DEPTH = int(os.environ.get("AUTOCOMPLETE_CACHE_DEPTH", 3))
+
+# Path of a memory-mapped catalog snapshot shared by all worker processes
+# on a host. When set, GET /questions, GET /categories/<id>/questions and
+# POST /quizzes read questions from it instead of the database, and every
+# question write rewrites it. Unset disables the snapshot.
+CATALOG_SNAPSHOT_PATH = os.environ.get("CATALOG_SNAPSHOT_PATH")
+
+# Search engine behind POST /questions: "postgresql" (tsvector + GIN),
+# "memory" (pure-Python inverted index) or "auto" to pick by database.
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")
+# Seconds before the "memory" engine's index is reloaded from the
+# database, so questions written by other worker processes become
+# searchable.
+SEARCH_INDEX_MAX_AGE = int(os.environ.get("SEARCH_INDEX_MAX_AGE", 300))
+
+# Question counters behind GET /stats: "triggers" (a table maintained by
+# PostgreSQL triggers), "memory" (in-process counters reloaded after
+# STATS_MAX_AGE seconds) or "auto" to pick by database. TOTALS_FROM_STATS
+# "true" makes the list routes read totalQuestions from them too; "auto"
+# only does so with the triggers, as the in-process counters can miss
+# other workers' writes for up to STATS_MAX_AGE seconds.
+STATS_BACKEND = os.environ.get("STATS_BACKEND", "auto")
+STATS_MAX_AGE = int(os.environ.get("STATS_MAX_AGE", 300))
+TOTALS_FROM_STATS = os.environ.get("TOTALS_FROM_STATS", "auto")
+
+# Search results (POST /questions with searchTerm) are cached as ordered
+# id lists per normalized term, validated against the catalog version.
+# At most SEARCH_CACHE_MAX_ENTRIES terms and SEARCH_CACHE_MAX_BYTES bytes
+# of ids are kept; 0 entries disables the cache.
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000))
+SEARCH_CACHE_MAX_BYTES = int(
+    os.environ.get("SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# Seconds the category map is cached for. Set CACHE_REDIS_URL to share
+# cached entries (and their invalidation) between worker processes.
+CATEGORY_CACHE_TTL = int(os.environ.get("CATEGORY_CACHE_TTL", 300))
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+
+# Cache-Control sent with ETagged GET responses; "no-cache" lets clients
+# store responses but revalidate them with If-None-Match every time.
+CACHE_CONTROL = os.environ.get("CACHE_CONTROL", "no-cache")
+
+# Group commit for POST /questions: inserts arriving within
+# GROUP_COMMIT_WINDOW_MS milliseconds of each other (or until
+# GROUP_COMMIT_MAX_BATCH are queued) share one transaction. 0 disables it.
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("GROUP_COMMIT_WINDOW_MS", 0))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", 100))
+
+# Rows written per transaction by POST /questions/import.
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+# Encoder for JSON responses: "orjson" (optional dependency), "stdlib",
+# or "auto" to use orjson whenever it is installed.
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto")
+
+# Connection pool of the database engine. DB_STATEMENT_TIMEOUT is in
+# milliseconds and only applies to PostgreSQL; 0 disables it.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "false") == "true"
+DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 0))
+
+# Comma-separated URIs of read replicas. GET routes, search and quiz reads
+# are spread over the healthy ones round-robin; writes use the primary.
+# DB_READ_YOUR_WRITES is the number of seconds a client that wrote keeps
+# reading from the primary (0 disables it).
+DB_REPLICA_URIS = [uri for uri in os.environ.get(
+    "DB_REPLICA_URIS", "").split(",") if uri]
+DB_REPLICA_CHECK_INTERVAL = float(
+    os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+DB_READ_YOUR_WRITES = float(os.environ.get("DB_READ_YOUR_WRITES", 0))
+
+# Compression of JSON and NDJSON responses, negotiated by Accept-Encoding
+# (brotli when the optional package is installed, else gzip). Bodies
+# smaller than COMPRESS_MIN_SIZE bytes are sent uncompressed; -1 disables
+# compression.
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))